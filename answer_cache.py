@@ -0,0 +1,80 @@
+"""
+In-memory LRU + TTL cache for Weather Agent answers
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class AnswerCache:
+    """Thread-safe answer cache bounded by entry count and per-entry age"""
+
+    def __init__(self, max_size: int = 1024, clock=time.monotonic):
+        self.max_size = max_size
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, answer)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(question: str, location: str) -> tuple:
+        """Build a cache key from a normalized question and resolved location"""
+        normalized = _PUNCTUATION.sub(" ", question.lower())
+        normalized = _WHITESPACE.sub(" ", normalized).strip()
+        return (normalized, location.lower().strip())
+
+    def get(self, key):
+        """Return the cached answer for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, answer = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return answer
+
+    def put(self, key, answer: str, ttl: float):
+        """Store an answer that stays valid for ttl seconds"""
+        if self.max_size <= 0 or ttl <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl, answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all cached answers (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Snapshot of cache size and hit/miss counters"""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
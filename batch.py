@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Batch mode for the Weather Agent: answer a JSONL file of questions
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from collections import deque
+
+from weather_agent import WeatherAgent
+
+
+class BatchRunner:
+    """Streams questions through a WeatherAgent with a bounded worker pool"""
+
+    def __init__(self, agent: WeatherAgent, workers: int = None,
+                 ordered: bool = False, question_field: str = "question"):
+        self.agent = agent
+        self.workers = max(1, workers or agent.config.max_concurrent_requests)
+        self.ordered = ordered
+        self.question_field = question_field
+        self.stats = {"answered": 0, "skipped": 0, "errors": 0}
+
+    async def run(self, source, out, completed_ids=frozenset()) -> dict:
+        """
+        Answer every question read from source and write JSONL results to out
+
+        Only a bounded number of questions is in flight at once, so memory
+        stays flat regardless of input size. In ordered mode results are
+        written in input order; otherwise as soon as they finish.
+
+        Args:
+            source: Text stream with one JSON question per line
+            out: Text stream the answers are written to
+            completed_ids: Ids already answered by a previous run
+
+        Returns:
+            Counters for answered, skipped and failed questions
+        """
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.workers)
+        # Ordered mode keeps a small reorder window behind the slowest question
+        window = self.workers * 2 if self.ordered else self.workers
+        pending = deque() if self.ordered else set()
+        index = 0
+
+        while True:
+            line = await loop.run_in_executor(None, source.readline)
+            if not line:
+                break
+            index += 1
+            item = self._parse_line(index, line)
+            if item is None:
+                continue
+            if item["id"] in completed_ids:
+                self.stats["skipped"] += 1
+                continue
+
+            task = asyncio.ensure_future(self._answer(item, slots))
+            if self.ordered:
+                pending.append(task)
+                if len(pending) >= window:
+                    self._write(out, await pending.popleft())
+            else:
+                pending.add(task)
+                if len(pending) >= window:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for finished in done:
+                        self._write(out, finished.result())
+
+        # Drain whatever is still in flight
+        if self.ordered:
+            while pending:
+                self._write(out, await pending.popleft())
+        elif pending:
+            done, _ = await asyncio.wait(pending)
+            for finished in done:
+                self._write(out, finished.result())
+
+        return self.stats
+
+    def _parse_line(self, index: int, line: str):
+        """Turn an input line into {"id", "question"}; None for blank lines"""
+        line = line.strip()
+        if not line:
+            return None
+
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            # Treat non-JSON lines as plain questions
+            record = line
+
+        if isinstance(record, dict):
+            item_id = record.get("id", record.get("request_id", index))
+            question = record.get(self.question_field, "")
+        else:
+            item_id = index
+            question = str(record)
+
+        return {"id": item_id, "question": question}
+
+    async def _answer(self, item: dict, slots: asyncio.Semaphore) -> dict:
+        """Answer a single question, recording failures instead of raising"""
+        result = dict(item)
+        async with slots:
+            try:
+                if not item["question"]:
+                    raise ValueError(f"missing '{self.question_field}' field")
+                # The agent turns failures into an apology; its final event tells them apart
+                final = None
+
+                def keep_final(event):
+                    nonlocal final
+                    if event["type"] in ("done", "error"):
+                        final = event
+
+                text = await self.agent.answer_question_async(item["question"], on_event=keep_final)
+                if final is not None and final["type"] == "error":
+                    result["error"] = text
+                else:
+                    result["answer"] = text
+            except Exception as e:
+                result["error"] = str(e)
+        return result
+
+    def _write(self, out, result: dict):
+        """Write one result line and flush so a crash loses nothing written"""
+        if "error" in result:
+            self.stats["errors"] += 1
+        else:
+            self.stats["answered"] += 1
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        out.flush()
+
+
+def _completed_id(raw: bytes):
+    """(True, id) for an answered output record, (False, None) for anything else"""
+    try:
+        record = json.loads(raw)
+    except ValueError:
+        return False, None
+    if isinstance(record, dict) and "answer" in record and "error" not in record:
+        return True, record.get("id")
+    return False, None
+
+
+def load_completed_ids(path: str) -> set:
+    """
+    Collect ids already written to an output file so a run can resume
+
+    Only answered records count as completed; a resumed run retries the
+    rest. Those records (errors, unreadable lines and a partially written
+    last line from a crash) are removed from the file first, so every id
+    ends up with exactly one record.
+    """
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+
+    superseded = False
+    with open(path, "rb") as f:
+        for raw in f:
+            done, item_id = _completed_id(raw) if raw.endswith(b"\n") else (False, None)
+            if done:
+                completed.add(item_id)
+            else:
+                superseded = True
+
+    if superseded:
+        # Rewrite through a temporary file so a crash keeps the old output
+        partial = path + ".resume"
+        with open(path, "rb") as f, open(partial, "wb") as out:
+            for raw in f:
+                if raw.endswith(b"\n") and _completed_id(raw)[0]:
+                    out.write(raw)
+        os.replace(partial, path)
+
+    return completed
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of weather questions")
+    parser.add_argument("input", nargs="?", default="-",
+                        help="JSONL file with one question per line ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="-",
+                        help="JSONL file to write answers to ('-' for stdout)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Number of questions answered concurrently")
+    parser.add_argument("--ordered", action="store_true",
+                        help="Write answers in input order")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip questions already answered in the output file")
+    parser.add_argument("--field", default="question",
+                        help="JSON field holding the question text")
+    args = parser.parse_args()
+
+    completed_ids = set()
+    if args.resume and args.output != "-":
+        completed_ids = load_completed_ids(args.output)
+
+    # Agent setup messages are logged to stderr, so stdout stays valid JSONL
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    agent = WeatherAgent()
+    runner = BatchRunner(agent, workers=args.workers,
+                         ordered=args.ordered, question_field=args.field)
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    if args.output == "-":
+        out = sys.stdout
+    else:
+        out = open(args.output, "a" if args.resume else "w", encoding="utf-8")
+
+    try:
+        stats = asyncio.run(runner.run(source, out, completed_ids))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"✅ Batch finished: {stats['answered']} answered, "
+          f"{stats['skipped']} skipped, {stats['errors']} errors", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
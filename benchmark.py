@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the Weather Agent hot paths
+
+Covers WeatherTool.get_weather, WeatherTool.extract_location_fallback,
+WeatherTool.query_forecast and WeatherAgent._format_mock_response at
+several city-table sizes and question lengths. Everything runs offline (the agent stays in mock mode).
+
+  python benchmark.py                          # print results
+  python benchmark.py -o baseline.json         # save a baseline
+  python benchmark.py --compare baseline.json  # flag regressions
+
+Each result reports the per-call latency (best and median of several
+runs), throughput, the peak bytes allocated by one call and the memory
+blocks allocated for what a call returns.
+"""
+
+import argparse
+import itertools
+import json
+import platform
+import statistics
+import sys
+import time
+import timeit
+import tracemalloc
+
+from build_city_db import synthetic_records
+from city_store import CityStore
+from weather_agent import WeatherAgent
+from weather_report import WeatherReport
+from weather_tool import BUILTIN_CITIES, WeatherTool
+
+DEFAULT_SIZES = (5, 10_000, 100_000)
+
+# Filler that makes a question longer without naming another city
+_FILLER = ("I am planning my afternoon and would really like to know ", "before I head out ")
+
+# Distinct cities cycled through by the throughput benchmarks
+ROTATION = 1000
+
+# Cities compared by one query_forecast call
+FORECAST_CITIES = 500
+
+
+def make_question(city: str, length: str) -> str:
+    """A question about city of roughly the requested length"""
+    if length == "short":
+        return f"Weather in {city}?"
+    if length == "medium":
+        return f"{_FILLER[0]}what the weather is like in {city} right now?"
+    return f"{_FILLER[0] * 4}what the weather is like in {city} {_FILLER[1] * 4}today?"
+
+
+def build_tool(size: int) -> tuple:
+    """WeatherTool over a table of size cities, plus city names to query"""
+    records = list(BUILTIN_CITIES)
+    if size > len(records):
+        records.extend(synthetic_records(size - len(records)))
+    tool = WeatherTool(CityStore.from_records(records[:size]))
+    step = max(1, size // ROTATION)
+    names = [record["name"] for record in records[:size:step]]
+    return tool, names
+
+
+def cycling(func, values):
+    """Zero-argument callable that applies func to values in turn"""
+    values = itertools.cycle(values)
+    return lambda: func(next(values))
+
+
+def tool_benchmarks(size: int) -> dict:
+    """Benchmarks over one city-table size"""
+    tool, names = build_tool(size)
+    far_city = names[-1]
+    tool.location_matcher  # open the lazy matcher outside the timings
+
+    benches = {
+        f"get_weather/known/{size}": lambda: tool.get_weather(far_city),
+        f"get_weather/unknown/{size}": lambda: tool.get_weather("Atlantis"),
+        f"get_weather/rotating/{size}": cycling(tool.get_weather, names),
+    }
+    for length in ("short", "medium", "long"):
+        question = make_question(far_city, length)
+        benches[f"extract_location/{length}/{size}"] = (
+            lambda question=question: tool.extract_location_fallback(question)
+        )
+    questions = [make_question(name, "medium") for name in names]
+    benches[f"extract_location/rotating/{size}"] = cycling(tool.extract_location_fallback, questions)
+
+    # One call over up to FORECAST_CITIES cities x the whole forecast
+    cities = names[:FORECAST_CITIES]
+    count = len(cities)
+    tool.query_forecast(cities, "temperature", "max")  # build their forecasts outside the timings
+    benches[f"query_forecast/max/{count}/{size}"] = (
+        lambda: tool.query_forecast(cities, "temperature", "max")
+    )
+    benches[f"query_forecast/hours_above/{count}/{size}"] = (
+        lambda: tool.query_forecast(cities, "humidity", "hours_above", threshold=80)
+    )
+    return benches
+
+
+def format_benchmarks() -> dict:
+    """Benchmarks of the mock-mode answer formatting"""
+    agent = WeatherAgent()
+    report = WeatherReport("London", 8, "Rainy", 80, None)
+
+    benches = {}
+    for intent, question in (("temperature", "How hot is it in London?"),
+                             ("humidity", "Is it humid in London?"),
+                             ("conditions", "What's the weather like in London?")):
+        benches[f"format_mock_response/{intent}"] = (
+            lambda question=question: agent._format_mock_response(report, question)
+        )
+    return benches
+
+
+def measure(func, repeat: int, min_time: float) -> dict:
+    """Time one zero-argument callable and count its allocations"""
+    func()  # warm caches and lazy state
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        if timer.timeit(number) >= min_time:
+            break
+        number *= 2
+    runs = [timer.timeit(number) / number for _ in range(repeat)]
+
+    # Results are kept alive so the snapshot diff counts the blocks each
+    # call allocates for them; temporaries show up in the peak instead
+    calls = 100
+    results = [None] * calls
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        func()
+        peak = tracemalloc.get_traced_memory()[1] - base
+
+        before = tracemalloc.take_snapshot()
+        for i in range(calls):
+            results[i] = func()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    blocks = sum(stat.count_diff for stat in after.filter_traces(ignore).compare_to(
+        before.filter_traces(ignore), "filename"))
+
+    median = statistics.median(runs)
+    return {
+        "ns_per_op": round(min(runs) * 1e9, 1),
+        "median_ns": round(median * 1e9, 1),
+        "ops_per_sec": round(1 / median) if median else None,
+        "alloc_peak_bytes": peak,
+        "alloc_blocks_per_op": round(blocks / calls, 2),
+    }
+
+
+def run(sizes, pattern: str, repeat: int, min_time: float) -> dict:
+    """Run every benchmark whose name contains pattern"""
+    benches = format_benchmarks()
+    for size in sizes:
+        benches.update(tool_benchmarks(size))
+
+    results = {}
+    for name, func in benches.items():
+        if pattern and pattern not in name:
+            continue
+        results[name] = measure(func, repeat, min_time)
+        print(format_row(name, results[name]), file=sys.stderr)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def format_row(name: str, result: dict) -> str:
+    return (f"{name:<36} {result['ns_per_op'] / 1000:>10.2f} µs "
+            f"{result['ops_per_sec']:>12,} ops/s "
+            f"{result['alloc_peak_bytes']:>8} B peak "
+            f"{result['alloc_blocks_per_op']:>7} blocks")
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """
+    Compare two benchmark runs
+
+    Returns:
+        Names of benchmarks whose best or median latency, peak allocation or
+        allocated blocks grew by more than threshold (a fraction, 0.1 = 10%)
+    """
+    regressions = []
+    for name, now in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        speed = now["ns_per_op"] / before["ns_per_op"] - 1
+        median = now["median_ns"] / before["median_ns"] - 1
+        memory = now["alloc_peak_bytes"] - before["alloc_peak_bytes"]
+        # Baselines saved before blocks were counted have no block figure
+        blocks = now["alloc_blocks_per_op"] - before.get("alloc_blocks_per_op", now["alloc_blocks_per_op"])
+        slower = speed > threshold or median > threshold
+        # Ignore byte-level noise on calls that allocate very little
+        bigger = memory > 64 and memory > before["alloc_peak_bytes"] * threshold
+        bigger = bigger or (blocks >= 1 and blocks > before.get("alloc_blocks_per_op", 0) * threshold)
+        marker = "❌" if slower or bigger else "✅"
+        print(f"{marker} {name:<36} {speed:+8.1%} best {median:+8.1%} median  "
+              f"{memory:+7} B peak {blocks:+7.2f} blocks")
+        if slower or bigger:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark the Weather Agent hot paths")
+    parser.add_argument("-o", "--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="Compare with a saved run and exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Allowed slowdown as a fraction (default: 0.10)")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Comma-separated city-table sizes")
+    parser.add_argument("-k", "--filter", default="",
+                        help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Timed runs per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="Minimum seconds per timed run")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    current = run(sizes, args.filter, args.repeat, args.min_time)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"✅ Wrote {len(current['results'])} results to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            sys.exit(1)
+        print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
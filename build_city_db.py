@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Build the city database used by WeatherTool
+
+Sources:
+  --geonames FILE   GeoNames dump (e.g. cities500.txt from
+                    https://download.geonames.org/export/dump/)
+  --synthetic N     N generated city names, for benchmarks
+
+The built-in demo cities are always included first, so their data and
+aliases win over duplicates. Weather for other cities is derived
+deterministically from the name, since the tool has no live data source.
+"""
+
+import argparse
+import csv
+import sys
+import zlib
+
+from city_store import CityStore
+from weather_tool import BUILTIN_CITIES
+
+DESCRIPTIONS = ["Sunny", "Clear", "Partly cloudy", "Cloudy", "Rainy", "Windy", "Foggy", "Snowy"]
+SYLLABLES = ["ka", "lo", "mi", "ra", "to", "ve", "na", "sha", "ber", "port",
+             "ville", "burg", "ton", "ford", "dale", "rio", "san", "el", "nova", "lin"]
+
+
+def demo_weather(name: str) -> dict:
+    """Deterministic pseudo-weather for a city name"""
+    h = zlib.crc32(name.encode("utf-8"))
+    return {
+        "temperature": (h % 45) - 10,
+        "humidity": 20 + (h >> 8) % 76,
+        "description": DESCRIPTIONS[(h >> 16) % len(DESCRIPTIONS)],
+    }
+
+
+def geonames_records(path: str, min_population: int):
+    """Yield city records from a GeoNames tab-separated dump, largest first"""
+    rows = []
+    with open(path, encoding="utf-8", newline="") as f:
+        for fields in csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+            population = int(fields[14] or 0)
+            if population >= min_population:
+                rows.append((population, fields[1], fields[2]))
+
+    # Bigger cities claim ambiguous names ("Springfield") first
+    rows.sort(reverse=True)
+    for _, name, ascii_name in rows:
+        record = {"name": name, "aliases": [ascii_name] if ascii_name != name else []}
+        record.update(demo_weather(name))
+        yield record
+
+
+def synthetic_records(count: int):
+    """Yield count unique generated city names"""
+    n = len(SYLLABLES)
+    for i in range(count):
+        parts = []
+        value = i
+        while True:
+            parts.append(SYLLABLES[value % n])
+            value //= n
+            if not value:
+                break
+        name = "".join(parts).title() + f" {i}"
+        record = {"name": name}
+        record.update(demo_weather(name))
+        yield record
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Build the WeatherTool city database")
+    parser.add_argument("output", help="Database file to write (e.g. data/cities.wdb)")
+    parser.add_argument("--geonames", help="GeoNames citiesNNN.txt dump to import")
+    parser.add_argument("--min-population", type=int, default=0,
+                        help="Skip GeoNames cities smaller than this")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Add this many generated cities")
+    args = parser.parse_args()
+
+    def records():
+        yield from BUILTIN_CITIES
+        if args.geonames:
+            yield from geonames_records(args.geonames, args.min_population)
+        if args.synthetic:
+            yield from synthetic_records(args.synthetic)
+
+    count = CityStore.build(args.output, records())
+    print(f"✅ Wrote {count} cities to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
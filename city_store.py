@@ -0,0 +1,283 @@
+"""
+Memory-mapped, column-oriented city database used by WeatherTool
+"""
+
+import mmap
+import re
+import struct
+import sys
+import zlib
+from array import array
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+MAGIC = b"WCDB"
+VERSION = 2
+# magic, version, rows, keys, slots, descriptions, then 10 section offsets
+_HEADER = struct.Struct("<4sIIIII10Q")
+# Version 2: matcher edge slots, matcher nodes, then 5 matcher section offsets
+_MATCHER_HEADER = struct.Struct("<QQ5Q")
+
+
+def normalize_name(name: str) -> str:
+    """Normalize a city name or alias for indexing and lookup"""
+    name = _NON_WORD.sub(" ", name.lower())
+    return _WHITESPACE.sub(" ", name).strip()
+
+
+class CityStore:
+    """
+    Read-only city table with an O(1) hash index on names and aliases
+
+    Columns (temperature, humidity, description id, name offsets) live in
+    one flat buffer, normally an mmap of a file written by CityStore.build,
+    and are read through typed memoryviews, so no per-city Python objects
+    are created at load time. The index is an open-addressing table keyed
+    by crc32 of the normalized name; each slot holds a key id + 1 (0 means
+    empty) and each key points at a row, so aliases share a row with their
+    city.
+
+    Sections (little-endian, 8-byte aligned):
+        temperature   int16[rows]
+        humidity      uint8[rows]
+        description   uint8[rows]   index into the description table
+        name_offsets  uint32[rows + 1]
+        names         utf-8 display names
+        key_offsets   uint32[keys + 1]
+        key_rows      uint32[keys]
+        keys          utf-8 normalized names and aliases
+        slots         uint32[slots]
+        descriptions  uint32 offsets[descs + 1] followed by utf-8 text
+
+    Version 2 files add the LocationMatcher automaton over the keys, so
+    it opens without being rebuilt (see matcher_sections()):
+        edge_keys     uint64[edge slots]
+        edge_child    uint32[edge slots]
+        fail          uint32[nodes]
+        length        uint16[nodes]
+        output        uint32[nodes]
+    """
+
+    def __init__(self, buffer):
+        if sys.byteorder != "little":
+            raise ValueError("City database files are little-endian only")
+
+        header = _HEADER.unpack_from(buffer, 0)
+        magic, version, rows, keys, slots, descs = header[:6]
+        if magic != MAGIC or version not in (1, VERSION):
+            raise ValueError("Not a city database file (bad magic or version)")
+
+        (temp_off, hum_off, desc_off, name_off_off, names_off,
+         key_off_off, key_rows_off, keys_off, slots_off, descs_off) = header[6:]
+
+        self._buffer = buffer
+        view = memoryview(buffer)
+        self.rows = rows
+        self.keys = keys
+        self._temperature = view[temp_off:temp_off + rows * 2].cast("h")
+        self._humidity = view[hum_off:hum_off + rows]
+        self._description = view[desc_off:desc_off + rows]
+        self._name_offsets = view[name_off_off:name_off_off + (rows + 1) * 4].cast("I")
+        self._names = view[names_off:names_off + self._name_offsets[rows]]
+        self._key_offsets = view[key_off_off:key_off_off + (keys + 1) * 4].cast("I")
+        self._key_rows = view[key_rows_off:key_rows_off + keys * 4].cast("I")
+        self._keys = view[keys_off:keys_off + self._key_offsets[keys]]
+        self._slots = view[slots_off:slots_off + slots * 4].cast("I")
+        self._mask = slots - 1
+
+        self._matcher_sections = None
+        if version >= 2:
+            edge_slots, nodes, *matcher_offsets = _MATCHER_HEADER.unpack_from(buffer, _HEADER.size)
+            edge_keys_off, edge_child_off, fail_off, length_off, output_off = matcher_offsets
+            self._matcher_sections = (
+                view[edge_keys_off:edge_keys_off + edge_slots * 8].cast("Q"),
+                view[edge_child_off:edge_child_off + edge_slots * 4].cast("I"),
+                view[fail_off:fail_off + nodes * 4].cast("I"),
+                view[length_off:length_off + nodes * 2].cast("H"),
+                view[output_off:output_off + nodes * 4].cast("I"),
+            )
+
+        # The description vocabulary is tiny, so decode it once
+        desc_offsets = view[descs_off:descs_off + (descs + 1) * 4].cast("I")
+        text_start = descs_off + (descs + 1) * 4
+        self._descriptions = [
+            bytes(view[text_start + desc_offsets[i]:text_start + desc_offsets[i + 1]]).decode("utf-8")
+            for i in range(descs)
+        ]
+
+    @classmethod
+    def open(cls, path: str) -> "CityStore":
+        """Memory-map a city database file written by build()"""
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer)
+
+    @classmethod
+    def from_records(cls, records) -> "CityStore":
+        """Build an in-memory store (used for the small built-in city list)"""
+        return cls(cls.encode(records))
+
+    @classmethod
+    def build(cls, path: str, records) -> int:
+        """
+        Write a city database file
+
+        Args:
+            path: Output file
+            records: Iterable of dicts with name, temperature, humidity,
+                description and optional aliases. When two records share a
+                normalized name or alias, the first one wins.
+
+        Returns:
+            Number of cities written
+        """
+        data = cls.encode(records)
+        with open(path, "wb") as f:
+            f.write(data)
+        return _HEADER.unpack_from(data, 0)[2]
+
+    @staticmethod
+    def encode(records) -> bytes:
+        """Encode records into the on-disk format"""
+        from location_matcher import LocationMatcher  # it imports normalize_name from here
+
+        temperature = array("h")
+        humidity = bytearray()
+        description = bytearray()
+        name_offsets = array("I", [0])
+        names = bytearray()
+        key_offsets = array("I", [0])
+        key_rows = array("I")
+        keys = bytearray()
+        key_hashes = []
+        key_names = []
+        seen_keys = set()
+        desc_ids = {}
+
+        for record in records:
+            row_keys = []
+            for raw in [record["name"]] + list(record.get("aliases", ())):
+                key = normalize_name(raw)
+                if key and key not in seen_keys:
+                    seen_keys.add(key)
+                    row_keys.append(key)
+            if not row_keys:
+                continue
+
+            row = len(temperature)
+            temperature.append(int(record["temperature"]))
+            humidity.append(int(record["humidity"]))
+            desc = record["description"]
+            if desc not in desc_ids:
+                if len(desc_ids) == 256:
+                    raise ValueError("At most 256 distinct descriptions are supported")
+                desc_ids[desc] = len(desc_ids)
+            description.append(desc_ids[desc])
+            names += record["name"].encode("utf-8")
+            name_offsets.append(len(names))
+
+            for key in row_keys:
+                encoded = key.encode("utf-8")
+                keys += encoded
+                key_offsets.append(len(keys))
+                key_rows.append(row)
+                key_hashes.append(zlib.crc32(encoded))
+                key_names.append(key)
+
+        # Power-of-two table at most half full keeps probe chains short
+        slot_count = 8
+        while slot_count < len(key_rows) * 2:
+            slot_count *= 2
+        mask = slot_count - 1
+        slots = array("I", bytes(slot_count * 4))
+        for key_id, key_hash in enumerate(key_hashes):
+            i = key_hash & mask
+            while slots[i]:
+                i = (i + 1) & mask
+            slots[i] = key_id + 1
+
+        desc_offsets = array("I", [0])
+        desc_text = bytearray()
+        for desc in desc_ids:
+            desc_text += desc.encode("utf-8")
+            desc_offsets.append(len(desc_text))
+
+        sections = [
+            temperature.tobytes(), bytes(humidity), bytes(description),
+            name_offsets.tobytes(), bytes(names), key_offsets.tobytes(),
+            key_rows.tobytes(), bytes(keys), slots.tobytes(),
+            desc_offsets.tobytes() + bytes(desc_text),
+        ]
+        matcher = LocationMatcher(key_names).sections()
+        sections += [section.tobytes() for section in matcher]
+        out = bytearray(_HEADER.size + _MATCHER_HEADER.size)
+        offsets = []
+        for section in sections:
+            out += bytes(-len(out) % 8)
+            offsets.append(len(out))
+            out += section
+
+        _HEADER.pack_into(out, 0, MAGIC, VERSION, len(temperature), len(key_rows),
+                          slot_count, len(desc_ids), *offsets[:10])
+        _MATCHER_HEADER.pack_into(out, _HEADER.size, len(matcher[1]), len(matcher[2]), *offsets[10:])
+        return bytes(out)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __contains__(self, name: str) -> bool:
+        return self.lookup(name) is not None
+
+    def lookup(self, name: str):
+        """Return the row for a city name or alias, or None if unknown"""
+        return self.lookup_normalized(normalize_name(name))
+
+    def lookup_normalized(self, key: str):
+        """lookup() for a name that is already normalized"""
+        encoded = key.encode("utf-8")
+        slots = self._slots
+        mask = self._mask
+        i = zlib.crc32(encoded) & mask
+        while True:
+            slot = slots[i]
+            if not slot:
+                return None
+            key_id = slot - 1
+            start = self._key_offsets[key_id]
+            end = self._key_offsets[key_id + 1]
+            if self._keys[start:end] == encoded:
+                return self._key_rows[key_id]
+            i = (i + 1) & mask
+
+    def name(self, row: int) -> str:
+        """Display name of a city"""
+        return bytes(self._names[self._name_offsets[row]:self._name_offsets[row + 1]]).decode("utf-8")
+
+    def temperature(self, row: int) -> int:
+        return self._temperature[row]
+
+    def humidity(self, row: int) -> int:
+        return self._humidity[row]
+
+    def description(self, row: int) -> str:
+        return self._descriptions[self._description[row]]
+
+    def matcher_sections(self):
+        """Saved LocationMatcher arrays for LocationMatcher.from_sections, or None in version 1 files"""
+        return self._matcher_sections
+
+    def temperature_column(self) -> memoryview:
+        """Every city's temperature by row, as an int16 view (no copy)"""
+        return self._temperature
+
+    def humidity_column(self) -> memoryview:
+        """Every city's humidity by row, as a uint8 view (no copy)"""
+        return self._humidity
+
+    def iter_keys(self):
+        """Yield (normalized name or alias, row) for every indexed key"""
+        offsets = self._key_offsets
+        for key_id in range(self.keys):
+            key = bytes(self._keys[offsets[key_id]:offsets[key_id + 1]]).decode("utf-8")
+            yield key, self._key_rows[key_id]
@@ -4,19 +4,82 @@ Configuration settings for the Weather Agent
 """
 
 import os
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+_env_loaded = False
+
+
+def load_env():
+    """Load variables from .env into the environment, once per process"""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
 
 
 class Config:
     """Simple configuration class"""
     
     def __init__(self):
+        # .env is read when the first Config is built, not at import time
+        load_env()
         self.google_api_key = os.getenv("GOOGLE_API_KEY")
         self.model_name = "gemini-1.5-flash"
         self.default_location = "San Francisco"
+        # Maximum number of questions answered concurrently by the async API
+        self.max_concurrent_requests = int(os.getenv("WEATHER_AGENT_MAX_CONCURRENCY", "32"))
+        # Model turns that may request tools before a final answer is forced
+        self.max_tool_steps = int(os.getenv("WEATHER_AGENT_MAX_TOOL_STEPS", "3"))
+        # Threads used to run the tool calls of one turn concurrently
+        self.tool_workers = int(os.getenv("WEATHER_AGENT_TOOL_WORKERS", "8"))
+        # "llm": the model always phrases the final answer
+        # "template": plain lookups are answered from a local template
+        self.final_answer_mode = os.getenv("WEATHER_AGENT_FINAL_ANSWER", "llm")
+        # Local intent router: "off", "on" (answer simple questions locally)
+        # or "shadow" (only compare its answers with the LLM's)
+        self.router_mode = os.getenv("WEATHER_AGENT_ROUTER", "off")
+        self.router_threshold = float(os.getenv("WEATHER_AGENT_ROUTER_THRESHOLD", "0.8"))
+        # "gemini" (mock mode without an API key) or "fake" for the offline
+        # stand-in model in fake_gemini.py, with its median latency and error rate
+        self.llm_backend = os.getenv("WEATHER_AGENT_LLM_BACKEND", "gemini")
+        self.fake_latency_ms = float(os.getenv("WEATHER_AGENT_FAKE_LATENCY_MS", "300"))
+        self.fake_error_rate = float(os.getenv("WEATHER_AGENT_FAKE_ERROR_RATE", "0"))
+        # Per-stage latency metrics; optional JSON lines file for every span
+        self.metrics_enabled = os.getenv("WEATHER_AGENT_METRICS", "").lower() in ("1", "true", "yes")
+        self.metrics_log_path = os.getenv("WEATHER_AGENT_METRICS_LOG")
+        # Admission control and retries for model calls (llm_scheduler.py):
+        # quota in requests per minute (0 = unlimited) with a burst allowance,
+        # the most calls in flight (lowered automatically on 429s), retries
+        # of transient errors, the time budget of one model call including
+        # retries, and the delay before a slow call is hedged (0 = never)
+        self.llm_requests_per_minute = float(os.getenv("WEATHER_AGENT_LLM_RPM", "0"))
+        self.llm_burst = int(os.getenv("WEATHER_AGENT_LLM_BURST", "5"))
+        self.llm_max_concurrency = int(os.getenv("WEATHER_AGENT_LLM_MAX_CONCURRENCY", "16"))
+        self.llm_max_retries = int(os.getenv("WEATHER_AGENT_LLM_MAX_RETRIES", "3"))
+        self.llm_timeout = float(os.getenv("WEATHER_AGENT_LLM_TIMEOUT", "30"))
+        self.llm_hedge_ms = float(os.getenv("WEATHER_AGENT_LLM_HEDGE_MS", "0"))
+        # Time budget for answering one question (0 = none), and the least time
+        # that must be left to start another model call; with less, the answer
+        # is rendered locally from the tool results instead
+        self.request_timeout = float(os.getenv("WEATHER_AGENT_REQUEST_TIMEOUT", "20"))
+        self.min_llm_budget = float(os.getenv("WEATHER_AGENT_MIN_LLM_BUDGET", "1.5"))
+        # Conversation memory: tokens of recent turns sent with each question,
+        # and of the summary that older turns are folded into
+        self.history_tokens = int(os.getenv("WEATHER_AGENT_HISTORY_TOKENS", "1000"))
+        self.history_summary_tokens = int(os.getenv("WEATHER_AGENT_HISTORY_SUMMARY_TOKENS", "200"))
+        # Share one computation between identical questions and tool calls in flight
+        self.coalesce_requests = os.getenv("WEATHER_AGENT_COALESCE", "1").lower() in ("1", "true", "yes")
+        # Longest a coalesced question waits on its leader, counted from the leader's
+        # start; past it the follower answers on its own (0 = twice as long as
+        # leaders have typically taken lately)
+        self.coalesce_wait_ms = float(os.getenv("WEATHER_AGENT_COALESCE_WAIT_MS", "0"))
+        # Number of answers kept in the in-memory answer cache (0 disables it)
+        self.answer_cache_size = int(os.getenv("WEATHER_AGENT_ANSWER_CACHE_SIZE", "1024"))
+        # Optional city database built with build_city_db.py
+        self.city_db_path = os.getenv("WEATHER_AGENT_CITY_DB")
+        # Optional SQLite file for persisting LLM turns across restarts
+        self.llm_cache_path = os.getenv("WEATHER_AGENT_LLM_CACHE")
+        self.llm_cache_max_bytes = int(os.getenv("WEATHER_AGENT_LLM_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
     
     def has_api_key(self) -> bool:
         """Check if Google API key is available"""
@@ -0,0 +1,157 @@
+"""
+Bounded multi-turn memory for one chat session
+"""
+
+import itertools
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+
+# Most places remembered from summarized turns
+MAX_PLACES = 8
+
+# Characters of each side of a turn kept in its summary line
+SUMMARY_CHARS = 80
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for English)"""
+    return len(text) // 4 + 1
+
+
+def _shorten(text: str) -> str:
+    text = " ".join(text.split())
+    if len(text) <= SUMMARY_CHARS:
+        return text
+    return text[:SUMMARY_CHARS - 1].rstrip() + "…"
+
+
+@dataclass(frozen=True)
+class Message:
+    """One chat message; slotted so long sessions stay small"""
+
+    __slots__ = ("role", "text", "locations")
+
+    role: str  # "user" or "assistant"
+    text: str
+    locations: tuple  # places looked up to answer (assistant messages)
+
+
+class Conversation:
+    """
+    Chat history of one session, with a token-bounded window for prompts
+
+    Every message is kept for display, up to max_messages. Prompts only see
+    the latest turns that fit in max_tokens; older turns are folded into a
+    summary of at most summary_tokens (one short line per turn plus the
+    places discussed), so prompt size stays bounded however long the
+    session runs. Summaries are built locally and cost no model calls.
+
+    Not thread-safe; each session owns its own Conversation.
+    """
+
+    def __init__(self, max_tokens: int = 1000, summary_tokens: int = 200, max_messages: int = 1000):
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.messages = deque(maxlen=max_messages)  # shown to the user
+        self._window = deque()  # (user Message, assistant Message) in the prompt
+        self._window_tokens = 0
+        self._summary = deque()  # one line per summarized turn
+        self._summary_tokens = 0
+        self._places = OrderedDict()  # location -> None, most recent last
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def add_turn(self, question: str, answer: str, locations=(), remember: bool = True):
+        """
+        Record a question and its answer
+
+        Args:
+            question: What the user asked
+            answer: The reply shown to the user
+            locations: Places looked up for the answer
+            remember: False keeps the turn out of future prompts (e.g. errors)
+        """
+        user = Message("user", question, ())
+        reply = Message("assistant", answer, tuple(locations))
+        self.messages.append(user)
+        self.messages.append(reply)
+        if not remember:
+            return
+
+        self._window.append((user, reply))
+        self._window_tokens += self._turn_tokens(user, reply)
+        # Always keep the latest turn, even if it alone is over budget
+        while self._window_tokens > self.max_tokens and len(self._window) > 1:
+            self._summarize(*self._window.popleft())
+
+    def recent(self, count: int) -> list:
+        """The last count messages, oldest first"""
+        start = max(0, len(self.messages) - count)
+        return list(itertools.islice(self.messages, start, None))
+
+    def has_history(self) -> bool:
+        """Whether earlier turns can give a new question context"""
+        return bool(self._window or self._summary or self._places)
+
+    def last_locations(self) -> list:
+        """Places of the most recent turn that looked any up ("what about there?")"""
+        for _, reply in reversed(self._window):
+            if reply.locations:
+                return list(reply.locations)
+        if self._places:
+            return [next(reversed(self._places))]
+        return []
+
+    def prompt_context(self) -> str:
+        """Summary and recent turns to put in front of a new question"""
+        lines = []
+        if self._places or self._summary:
+            lines.append("Summary of the earlier conversation:")
+            if self._places:
+                lines.append(f"Places discussed: {', '.join(self._places)}")
+            lines.extend(self._summary)
+        if self._window:
+            lines.append("Recent conversation:")
+            for user, reply in self._window:
+                lines.append(f"User: {user.text}")
+                lines.append(f"Assistant: {reply.text}")
+        return "\n".join(lines)
+
+    def get_stats(self) -> dict:
+        """Stored messages and the token cost of the prompt context"""
+        return {
+            "messages": len(self.messages),
+            "window_turns": len(self._window),
+            "window_tokens": self._window_tokens,
+            "summarized_turns": len(self._summary),
+            "summary_tokens": self._summary_tokens,
+        }
+
+    def clear(self):
+        """Forget the whole conversation"""
+        self.messages.clear()
+        self._window.clear()
+        self._window_tokens = 0
+        self._summary.clear()
+        self._summary_tokens = 0
+        self._places.clear()
+
+    @staticmethod
+    def _turn_tokens(user: Message, reply: Message) -> int:
+        return estimate_tokens(user.text) + estimate_tokens(reply.text)
+
+    def _summarize(self, user: Message, reply: Message):
+        """Move a turn out of the window into the summary"""
+        self._window_tokens -= self._turn_tokens(user, reply)
+        for location in reply.locations:
+            self._places.pop(location, None)
+            self._places[location] = None
+        while len(self._places) > MAX_PLACES:
+            self._places.popitem(last=False)
+
+        line = f"- {_shorten(user.text)} -> {_shorten(reply.text)}"
+        self._summary.append(line)
+        self._summary_tokens += estimate_tokens(line)
+        while self._summary_tokens > self.summary_tokens and self._summary:
+            self._summary_tokens -= estimate_tokens(self._summary.popleft())
@@ -0,0 +1,43 @@
+"""
+Time budgets that follow a request through the agent pipeline
+"""
+
+import time
+
+
+class DeadlineExceeded(TimeoutError):
+    """A request ran out of its time budget"""
+
+
+class Deadline:
+    """
+    The moment (on the time.monotonic clock) by which a request must be answered
+
+    Create one with Deadline.after(seconds) and pass it down; every stage
+    asks remaining() how long it may take.
+    """
+
+    __slots__ = ("expires_at",)
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        """Deadline seconds from now"""
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        """Seconds left, never negative"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self, stage: str = "the request"):
+        """Raise DeadlineExceeded if the budget is used up"""
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline exceeded before {stage}")
+
+    def __repr__(self) -> str:
+        return f"Deadline(remaining={self.remaining():.3f}s)"
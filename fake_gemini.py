@@ -0,0 +1,259 @@
+"""
+Offline stand-in for the Gemini model, for load tests and benchmarks
+"""
+
+import asyncio
+import json
+import random
+import threading
+import time
+
+from weather_tool import WeatherTool
+
+
+class FakeGeminiError(Exception):
+    """Injected model failure carrying an HTTP-style status code (429, 500, 503...)"""
+
+    def __init__(self, code: int):
+        super().__init__(f"{code} Fake Gemini error")
+        self.code = code
+
+
+class FakeGeminiClient:
+    """
+    Drop-in replacement for GeminiClient that never touches the network
+
+    It behaves like a well-prompted model: the first turn calls get_weather
+    for every city named in the question (or query_forecast once, for
+    forecast questions), and the turn after the function responses phrases
+    them as an answer. Latency per turn is drawn from a configurable
+    distribution, and a fraction of turns can fail with FakeGeminiError so
+    retry and error paths can be exercised.
+
+    Args:
+        latency_ms: Median latency of one model turn
+        distribution: "fixed", "uniform" (0 to 2x the median) or
+            "lognormal" (long right tail, shaped by jitter)
+        jitter: Sigma of the lognormal distribution
+        error_rate: Fraction of turns that raise FakeGeminiError
+        error_codes: Status codes picked at random for injected errors
+        slow_rate: Fraction of turns that take slow_ms instead
+        slow_ms: Latency of a slow turn (a stuck backend)
+        tool_mode: "auto" (call tools for recognized cities), "always"
+            (also for unrecognized places) or "never" (answer directly)
+        weather_tool: Used to find cities in the question; pass the
+            agent's tool so larger city databases are recognized
+        seed: Seed for reproducible latencies and errors
+    """
+
+    DISTRIBUTIONS = ("fixed", "uniform", "lognormal")
+    TOOL_MODES = ("auto", "always", "never")
+
+    # Words that make the fake ask for a forecast instead of current weather
+    FORECAST_WORDS = {"forecast", "week", "tomorrow", "warmest", "coldest", "coolest"}
+
+    # Share of a streamed turn's latency spent before the first chunk
+    FIRST_CHUNK_SHARE = 0.5
+
+    def __init__(self, latency_ms: float = 300.0, distribution: str = "lognormal",
+                 jitter: float = 0.3, error_rate: float = 0.0,
+                 error_codes: tuple = (429, 500, 503), slow_rate: float = 0.0,
+                 slow_ms: float = 10000.0, tool_mode: str = "auto",
+                 weather_tool: WeatherTool = None, seed: int = None):
+        if distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {distribution}")
+        if tool_mode not in self.TOOL_MODES:
+            raise ValueError(f"Unknown tool mode: {tool_mode}")
+        self.model_name = "fake-gemini"
+        self.latency_ms = latency_ms
+        self.distribution = distribution
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_codes = tuple(error_codes)
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.tool_mode = tool_mode
+        self.weather_tool = weather_tool if weather_tool is not None else WeatherTool()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "errors": 0, "timeouts": 0, "in_flight": 0, "peak_in_flight": 0}
+
+    def generate(self, history: list, tools: list = None, timeout: float = None) -> dict:
+        """Run one model turn and return it as a model history entry"""
+        delay, error = self._begin()
+        try:
+            time.sleep(self._wait(delay, timeout))
+            return self._finish(history, tools, error, delay, timeout)
+        finally:
+            self._end()
+
+    async def generate_async(self, history: list, tools: list = None, timeout: float = None) -> dict:
+        """Async version of generate() that does not block the event loop"""
+        delay, error = self._begin()
+        try:
+            await asyncio.sleep(self._wait(delay, timeout))
+            return self._finish(history, tools, error, delay, timeout)
+        finally:
+            self._end()
+
+    def stream(self, history: list, tools: list = None, timeout: float = None):
+        """
+        Run one model turn with streaming
+
+        Yields:
+            Partial model entries, one per word of the answer text
+        """
+        delay, error = self._begin()
+        try:
+            time.sleep(self._wait(delay, timeout, self.FIRST_CHUNK_SHARE))
+            chunks = self._chunks(self._finish(history, tools, error, delay, timeout))
+            gap = delay * (1 - self.FIRST_CHUNK_SHARE) / len(chunks)
+            for i, chunk in enumerate(chunks):
+                if i:
+                    time.sleep(gap)
+                yield chunk
+        finally:
+            self._end()
+
+    async def stream_async(self, history: list, tools: list = None, timeout: float = None):
+        """Async version of stream()"""
+        delay, error = self._begin()
+        try:
+            await asyncio.sleep(self._wait(delay, timeout, self.FIRST_CHUNK_SHARE))
+            chunks = self._chunks(self._finish(history, tools, error, delay, timeout))
+            gap = delay * (1 - self.FIRST_CHUNK_SHARE) / len(chunks)
+            for i, chunk in enumerate(chunks):
+                if i:
+                    await asyncio.sleep(gap)
+                yield chunk
+        finally:
+            self._end()
+
+    def get_stats(self) -> dict:
+        """Snapshot of call, error and concurrency counters"""
+        with self._lock:
+            return dict(self.stats)
+
+    def _begin(self) -> tuple:
+        """Count a new turn and draw its latency and injected error"""
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["in_flight"] += 1
+            self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.stats["in_flight"])
+            delay = self._sample_latency()
+            error = None
+            if self.error_rate and self._random.random() < self.error_rate:
+                error = FakeGeminiError(self._random.choice(self.error_codes))
+                self.stats["errors"] += 1
+        return delay, error
+
+    def _end(self):
+        with self._lock:
+            self.stats["in_flight"] -= 1
+
+    def _sample_latency(self) -> float:
+        """Seconds for one turn; callers hold the lock"""
+        if self.slow_rate and self._random.random() < self.slow_rate:
+            return self.slow_ms / 1000
+        median = self.latency_ms / 1000
+        if self.distribution == "fixed":
+            return median
+        if self.distribution == "uniform":
+            return self._random.uniform(0, 2 * median)
+        return self._random.lognormvariate(0, self.jitter) * median
+
+    @staticmethod
+    def _wait(delay: float, timeout: float, share: float = 1.0) -> float:
+        """Seconds until share of the turn has elapsed, or the request times out"""
+        if timeout is not None and delay > timeout:
+            return timeout
+        return delay * share
+
+    def _finish(self, history: list, tools: list, error, delay: float, timeout: float) -> dict:
+        if timeout is not None and delay > timeout:
+            with self._lock:
+                self.stats["timeouts"] += 1
+            raise TimeoutError("Fake Gemini request timed out")
+        if error is not None:
+            raise error
+        return self._turn(history, tools)
+
+    def _turn(self, history: list, tools: list) -> dict:
+        """What a cooperative model would say next"""
+        last = history[-1]
+        if last["role"] == "function":
+            return self._model_entry(self._answer(last["responses"]))
+
+        context, _, question = last.get("text", "").rpartition("User question:")
+        if tools and self.tool_mode != "never":
+            locations = self.weather_tool.extract_locations(question)
+            if not locations and "Recent conversation:" in context:
+                # A follow-up: the place most recently mentioned in the conversation
+                locations = self.weather_tool.extract_locations(context)[-1:]
+            if not locations and self.tool_mode == "always":
+                locations = [self.weather_tool.extract_location_fallback(question)]
+            if locations and self._wants_forecast(question, tools):
+                return self._model_entry("", [self._forecast_call(question, locations)])
+            if locations:
+                calls = [{"name": "get_weather", "args": {"location": location}}
+                         for location in locations]
+                return self._model_entry("", calls)
+        return self._model_entry("I can help with weather questions. Which city are you interested in?")
+
+    @staticmethod
+    def _wants_forecast(question: str, tools: list) -> bool:
+        words = set(question.lower().replace("?", " ").split())
+        return (any(tool["name"] == "query_forecast" for tool in tools)
+                and bool(words & FakeGeminiClient.FORECAST_WORDS))
+
+    @staticmethod
+    def _forecast_call(question: str, locations: list) -> dict:
+        """A query_forecast call for the few phrasings the fake understands"""
+        text = question.lower()
+        metric = "humidity" if "humid" in text else "temperature"
+        aggregate = "min" if any(word in text for word in ("coldest", "coolest", "lowest")) else "max"
+        args = {"locations": locations, "metric": metric, "aggregate": aggregate}
+        if "tomorrow" in text:
+            args.update(start_day=1, days=1)
+        return {"name": "query_forecast", "args": args}
+
+    @staticmethod
+    def _answer(responses: list) -> str:
+        """Phrase function responses as a final answer"""
+        sentences = []
+        for item in responses:
+            response = item["response"]
+            if "error" in response:
+                sentences.append(f"Sorry, I couldn't look that up ({response['error']}).")
+                continue
+            result = response["result"]
+            data = json.loads(result) if isinstance(result, str) else result
+            if isinstance(data, dict) and "results" in data:
+                ranking = ", ".join(f"{location} {value:g}{data['unit']}"
+                                    for location, value in data["results"].items())
+                sentences.append(f"Forecast {data['aggregate']} {data['metric']} over "
+                                 f"{data['days']} day(s): {ranking}.")
+                continue
+            if not isinstance(data, dict) or "temperature" not in data:
+                sentences.append(f"Here is what I found: {result}")
+                continue
+            sentences.append(
+                f"In {data['location']} it's {data['description'].lower()} "
+                f"at {data['temperature']}°C with {data['humidity']}% humidity."
+            )
+        return " ".join(sentences)
+
+    @staticmethod
+    def _model_entry(text: str, function_calls: list = None) -> dict:
+        return {"role": "model", "text": text, "function_calls": function_calls or []}
+
+    @staticmethod
+    def _chunks(turn: dict) -> list:
+        """Split a turn the way streaming delivers it: calls whole, text word by word"""
+        if turn["function_calls"] or not turn["text"]:
+            return [turn]
+        words = turn["text"].split(" ")
+        return [
+            FakeGeminiClient._model_entry(word + (" " if i < len(words) - 1 else ""))
+            for i, word in enumerate(words)
+        ]
@@ -0,0 +1,235 @@
+"""
+Array-backed hourly and daily forecasts for the cities of a CityStore
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from city_store import CityStore
+
+# Forecast conditions, indexed by the codes in the conditions column
+CONDITIONS = ("Clear", "Partly cloudy", "Cloudy", "Rainy")
+
+# Humidity (%) from which an hour counts as partly cloudy, cloudy and rainy
+_CONDITION_HUMIDITY = (50, 65, 80)
+
+HOURS_PER_DAY = 24
+
+# Hourly temperatures are stored in tenths of a degree
+TEMPERATURE_SCALE = 10
+
+# Random streams of the generator, mixed into its counters
+_DRIFT, _NOISE = 1, 2
+
+
+def _hash_normal(keys: np.ndarray) -> np.ndarray:
+    """Standard normal values that depend only on their uint64 keys (splitmix64 + Box-Muller)"""
+    z = keys + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z ^= z >> np.uint64(31)
+    u1 = ((z >> np.uint64(40)) + np.uint64(1)).astype(np.float32) / np.float32(1 << 24)
+    u2 = (z & np.uint64(0xFFFFFF)).astype(np.float32) / np.float32(1 << 24)
+    return np.sqrt(-2 * np.log(u1)) * np.cos(np.float32(2 * np.pi) * u2)
+
+
+class _Series:
+    """Hourly and daily forecast columns for a block of cities, one row each"""
+
+    __slots__ = ("hourly", "conditions", "daily")
+
+    def __init__(self, rows: int, hours: int):
+        days = hours // HOURS_PER_DAY
+        self.hourly = {
+            "temperature": np.empty((rows, hours), dtype=np.int16),
+            "humidity": np.empty((rows, hours), dtype=np.uint8),
+        }
+        self.conditions = np.empty((rows, hours), dtype=np.uint8)
+        self.daily = {
+            metric: {name: np.empty((rows, days), dtype=np.float32) for name in ("max", "min", "mean")}
+            for metric in self.hourly
+        }
+
+    def columns(self) -> list:
+        return [*self.hourly.values(), self.conditions,
+                *(array for daily in self.daily.values() for array in daily.values())]
+
+
+class ForecastStore:
+    """
+    Hourly forecasts for the cities of a CityStore, generated on demand
+
+    Forecasts are synthetic demo data. Temperature follows a daily cycle
+    (warmest mid-afternoon) on top of a random day-to-day drift, humidity
+    moves the other way, and conditions are derived from humidity. Hour 0
+    is each city's current reading. The random values are hashed from
+    (seed, row, hour), so a city's forecast is the same whenever and
+    alongside whichever cities it is built.
+
+    Only the cities that queries ask for are built. Their series are kept
+    in fixed-size columns of max_rows slots with least-recently-used
+    eviction, so memory stays bounded however large the city table is:
+
+        temperature   int16[slots, hours]   tenths of °C
+        humidity      uint8[slots, hours]   %
+        conditions    uint8[slots, hours]   index into CONDITIONS
+
+    Daily minimum, maximum and mean of temperature and humidity are kept
+    next to them as float32[slots, days], so whole-day aggregates read 24
+    times less data. A query is one indexed NumPy reduction over all its
+    cities.
+    """
+
+    METRICS = ("temperature", "humidity")
+    AGGREGATES = ("max", "min", "mean", "hours_above", "hours_below", "hours_with")
+    UNITS = {"temperature": "°C", "humidity": "%"}
+
+    def __init__(self, city_store: CityStore, days: int = 7, seed: int = 0, max_rows: int = 4096):
+        if days < 1:
+            raise ValueError("Forecasts must cover at least one day")
+        self.days = days
+        self.hours = days * HOURS_PER_DAY
+        self.seed = seed
+        self.max_rows = max_rows
+        self._current_temperature = np.frombuffer(city_store.temperature_column(), dtype=np.int16)
+        self._current_humidity = np.frombuffer(city_store.humidity_column(), dtype=np.uint8)
+
+        hour_of_day = np.arange(self.hours) % HOURS_PER_DAY
+        self._cycle = np.sin((hour_of_day - 9) * (2 * np.pi / HOURS_PER_DAY)).astype(np.float32)
+
+        self._lock = threading.Lock()
+        self._series = _Series(max_rows, self.hours)  # pages are only touched when used
+        self._slots = OrderedDict()  # city row -> slot, least recently used first
+        self._free = list(range(max_rows - 1, -1, -1))
+        self.generated = 0
+
+    def aggregate(self, rows, metric: str = "temperature", aggregate: str = "max",
+                  start_day: int = 0, days: int = None, threshold: float = None,
+                  condition: str = None) -> np.ndarray:
+        """
+        One value per requested city over a range of forecast days
+
+        Args:
+            rows: City rows (sequence or int array)
+            metric: "temperature" or "humidity"
+            aggregate: "max", "min" or "mean" of the metric; "hours_above" or
+                "hours_below" a threshold; "hours_with" a condition
+            start_day: First day of the range (0 is today)
+            days: Days in the range; defaults to the rest of the forecast
+            threshold: Limit for hours_above and hours_below, in metric units
+            condition: One of CONDITIONS, for hours_with
+
+        Returns:
+            float32 array of values (hour counts for the hours_* aggregates)
+        """
+        if metric not in self.METRICS:
+            raise ValueError(f"Unknown forecast metric: {metric}")
+        if aggregate not in self.AGGREGATES:
+            raise ValueError(f"Unknown forecast aggregate: {aggregate}")
+        if not 0 <= start_day < self.days:
+            raise ValueError(f"start_day must be between 0 and {self.days - 1}")
+        if days is not None and days < 1:
+            raise ValueError("days must be at least 1")
+        if aggregate == "hours_with" and condition not in CONDITIONS:
+            raise ValueError(f"condition must be one of: {', '.join(CONDITIONS)}")
+        if aggregate in ("hours_above", "hours_below") and threshold is None:
+            raise ValueError(f"{aggregate} needs a threshold")
+        end_day = self.days if days is None else min(self.days, start_day + days)
+        rows = np.asarray(rows, dtype=np.intp)
+
+        # Slots are only rewritten under the lock, so hold it until the reduction is done
+        with self._lock:
+            if len(rows) > self.max_rows:
+                # Too many cities to cache; build them just for this query
+                series = _Series(len(rows), self.hours)
+                self._generate(rows, series, np.arange(len(rows)))
+                index = np.arange(len(rows))
+            else:
+                series = self._series
+                index = self._slots_for(rows)
+            return self._reduce(series, index, metric, aggregate, start_day, end_day,
+                                threshold, condition)
+
+    def get_stats(self) -> dict:
+        """Cached cities and the memory their columns can take"""
+        with self._lock:
+            return {
+                "cached_rows": len(self._slots),
+                "max_rows": self.max_rows,
+                "hours": self.hours,
+                "generated": self.generated,
+                "max_bytes": sum(array.nbytes for array in self._series.columns()),
+            }
+
+    def _slots_for(self, rows: np.ndarray) -> np.ndarray:
+        """Slot of every requested row, building the missing ones in one batch"""
+        slots = self._slots
+        missing = []
+        for row in rows.tolist():
+            if row in slots:
+                slots.move_to_end(row)
+            elif row not in missing:
+                missing.append(row)
+
+        if missing:
+            # Requested rows were just moved to the end, so eviction never reaches them
+            while len(self._free) < len(missing):
+                self._free.append(slots.popitem(last=False)[1])
+            new_slots = [self._free.pop() for _ in missing]
+            self._generate(np.asarray(missing, dtype=np.intp), self._series,
+                           np.asarray(new_slots, dtype=np.intp))
+            slots.update(zip(missing, new_slots))
+        return np.fromiter((slots[row] for row in rows.tolist()), dtype=np.intp, count=len(rows))
+
+    def _generate(self, rows: np.ndarray, series: _Series, index: np.ndarray):
+        """Write the forecasts of rows into series at index"""
+        count = len(rows)
+        base = (np.uint64(self.seed) << np.uint64(44)) + (rows.astype(np.uint64) << np.uint64(12))
+
+        offsets = np.arange(self.days, dtype=np.uint64) + (np.uint64(_DRIFT) << np.uint64(40))
+        drift = _hash_normal(base[:, None] + offsets).cumsum(axis=1)
+        drift = np.repeat(drift, HOURS_PER_DAY, axis=1)
+        offsets = np.arange(self.hours, dtype=np.uint64) + (np.uint64(_NOISE) << np.uint64(40))
+        noise = _hash_normal(base[:, None] + offsets)
+
+        values = 4 * self._cycle + 2 * drift + 0.5 * noise
+        values += self._current_temperature[rows].astype(np.float32)[:, None] - values[:, :1]
+        temperature = np.round(values * TEMPERATURE_SCALE).astype(np.int16)
+
+        values = -10 * self._cycle - 5 * drift + 3 * noise
+        values += self._current_humidity[rows].astype(np.float32)[:, None] - values[:, :1]
+        humidity = np.clip(np.round(values), 5, 100).astype(np.uint8)
+
+        series.hourly["temperature"][index] = temperature
+        series.hourly["humidity"][index] = humidity
+        series.conditions[index] = np.digitize(humidity, _CONDITION_HUMIDITY)
+        for metric, hourly in (("temperature", temperature), ("humidity", humidity)):
+            by_day = hourly.reshape(count, self.days, HOURS_PER_DAY)
+            scale = self._scale(metric)
+            daily = series.daily[metric]
+            daily["max"][index] = by_day.max(axis=2) / scale
+            daily["min"][index] = by_day.min(axis=2) / scale
+            daily["mean"][index] = by_day.mean(axis=2, dtype=np.float32) / scale
+        self.generated += count
+
+    def _reduce(self, series: _Series, index: np.ndarray, metric: str, aggregate: str,
+                start_day: int, end_day: int, threshold: float, condition: str) -> np.ndarray:
+        if aggregate in ("max", "min", "mean"):
+            block = series.daily[metric][aggregate][index, start_day:end_day]
+            # Days are equally long, so the mean of daily means is the overall mean
+            return getattr(block, aggregate)(axis=1)
+
+        hours = slice(start_day * HOURS_PER_DAY, end_day * HOURS_PER_DAY)
+        if aggregate == "hours_with":
+            matches = series.conditions[index, hours] == CONDITIONS.index(condition)
+        else:
+            block = series.hourly[metric][index, hours]
+            limit = threshold * self._scale(metric)
+            matches = block > limit if aggregate == "hours_above" else block < limit
+        return np.count_nonzero(matches, axis=1).astype(np.float32)
+
+    @staticmethod
+    def _scale(metric: str) -> int:
+        return TEMPERATURE_SCALE if metric == "temperature" else 1
@@ -0,0 +1,181 @@
+"""
+Thin wrapper around the Gemini model used by the Weather Agent
+"""
+
+import importlib.util
+import threading
+
+# google.generativeai (with grpc and protobuf) takes most of a second to
+# import, so it is only loaded once the first real request needs it
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def sdk_available() -> bool:
+    """Whether the Gemini SDK is installed, without importing it"""
+    try:
+        return importlib.util.find_spec("google.generativeai") is not None
+    except ImportError:
+        return False
+
+
+def _load_genai():
+    """Import the Gemini SDK on first use"""
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                _genai = genai
+    return _genai
+
+
+def _to_plain(value):
+    """Deep-copy proto map and repeated values (MapComposite, RepeatedComposite) into dicts and lists"""
+    if value is None or isinstance(value, (str, bytes, bool, int, float)):
+        return value
+    if hasattr(value, "keys"):
+        return {key: _to_plain(value[key]) for key in value.keys()}
+    return [_to_plain(item) for item in value]
+
+
+class GeminiClient:
+    """
+    Turn-based interface to Gemini shared by the sync and async agent paths
+
+    Conversation history is a list of plain dicts:
+        {"role": "user", "text": "..."}
+        {"role": "model", "text": "...", "function_calls": [{"name": ..., "args": {...}}]}
+        {"role": "function", "responses": [{"name": ..., "response": {...}}]}
+
+    Creating a client is free; the SDK is imported and configured on the
+    first model turn.
+    """
+    
+    def __init__(self, api_key: str, model_name: str):
+        self.model_name = model_name
+        self._api_key = api_key
+        self._model = None
+        self._model_lock = threading.Lock()
+    
+    @property
+    def model(self):
+        """The Gemini GenerativeModel, configured on first use"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    genai = _load_genai()
+                    genai.configure(api_key=self._api_key)
+                    self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+    
+    def generate(self, history: list, tools: list = None, timeout: float = None) -> dict:
+        """
+        Run one model turn and return it as a model history entry
+        
+        Args:
+            history: Conversation so far
+            tools: Function declarations the model may call
+            timeout: Seconds the API request may take
+        """
+        response = self.model.generate_content(
+            self._to_contents(history),
+            **self._request_kwargs(tools, timeout)
+        )
+        return self._parse_response(response)
+    
+    async def generate_async(self, history: list, tools: list = None, timeout: float = None) -> dict:
+        """Async version of generate() that does not block the event loop"""
+        response = await self.model.generate_content_async(
+            self._to_contents(history),
+            **self._request_kwargs(tools, timeout)
+        )
+        return self._parse_response(response)
+    
+    def stream(self, history: list, tools: list = None, timeout: float = None):
+        """
+        Run one model turn with streaming
+        
+        Yields:
+            Partial model entries (text deltas and any function calls) as they arrive
+        """
+        response = self.model.generate_content(
+            self._to_contents(history),
+            stream=True,
+            **self._request_kwargs(tools, timeout)
+        )
+        for chunk in response:
+            yield self._parse_response(chunk)
+    
+    async def stream_async(self, history: list, tools: list = None, timeout: float = None):
+        """Async version of stream()"""
+        response = await self.model.generate_content_async(
+            self._to_contents(history),
+            stream=True,
+            **self._request_kwargs(tools, timeout)
+        )
+        async for chunk in response:
+            yield self._parse_response(chunk)
+    
+    @staticmethod
+    def _request_kwargs(tools: list, timeout: float) -> dict:
+        kwargs = {}
+        if tools:
+            kwargs["tools"] = tools
+            kwargs["tool_config"] = {'function_calling_config': 'AUTO'}
+        if timeout is not None:
+            kwargs["request_options"] = {"timeout": timeout}
+        return kwargs
+    
+    @staticmethod
+    def _to_contents(history: list) -> list:
+        """Convert plain history entries into Gemini Content protos"""
+        genai = _load_genai()
+        contents = []
+        for entry in history:
+            if entry["role"] == "function":
+                parts = [
+                    genai.protos.Part(
+                        function_response=genai.protos.FunctionResponse(
+                            name=item["name"],
+                            response=item["response"]
+                        )
+                    )
+                    for item in entry["responses"]
+                ]
+                contents.append(genai.protos.Content(role="user", parts=parts))
+                continue
+            
+            parts = []
+            if entry.get("text"):
+                parts.append(genai.protos.Part(text=entry["text"]))
+            for call in entry.get("function_calls", []):
+                parts.append(genai.protos.Part(
+                    function_call=genai.protos.FunctionCall(
+                        name=call["name"],
+                        args=call["args"]
+                    )
+                ))
+            contents.append(genai.protos.Content(role=entry["role"], parts=parts))
+        return contents
+    
+    @staticmethod
+    def _parse_response(response) -> dict:
+        """Extract text and function calls from the first candidate"""
+        text_parts = []
+        function_calls = []
+        if response.candidates and response.candidates[0].content.parts:
+            for part in response.candidates[0].content.parts:
+                if hasattr(part, 'function_call') and part.function_call:
+                    function_calls.append({
+                        "name": part.function_call.name,
+                        "args": _to_plain(part.function_call.args)
+                    })
+                elif getattr(part, 'text', ''):
+                    text_parts.append(part.text)
+        
+        return {
+            "role": "model",
+            "text": "".join(text_parts),
+            "function_calls": function_calls
+        }
@@ -0,0 +1,106 @@
+"""
+Local router that answers simple weather questions without the LLM
+"""
+
+import re
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from response_formatter import ResponseFormatter
+from weather_tool import WeatherTool
+
+_NUMBER = re.compile(r"-?\d+")
+
+
+@dataclass(frozen=True)
+class RouteDecision:
+    """Router verdict for one question"""
+
+    __slots__ = ("intent", "locations", "confidence", "answer")
+
+    intent: Optional[str]
+    locations: tuple
+    confidence: float
+    answer: Optional[str]
+
+
+class IntentRouter:
+    """
+    Classifies questions as locally answerable and answers them from templates
+
+    A question scores high when it names exactly one known city, asks for
+    a recognized reading (temperature, humidity, conditions) and carries
+    no sign of needing reasoning. Questions at or above the threshold are
+    answered locally; in shadow mode the local answer is only compared
+    against the LLM's so the threshold can be tuned safely.
+    """
+
+    # How many recent shadow disagreements to keep for inspection
+    MAX_MISMATCHES = 100
+
+    def __init__(self, weather_tool: WeatherTool, formatter: ResponseFormatter,
+                 threshold: float = 0.8):
+        self.weather_tool = weather_tool
+        self.formatter = formatter
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.stats = {"routed": 0, "passed": 0, "shadow_agreed": 0, "shadow_disagreed": 0}
+        self.shadow_mismatches = deque(maxlen=self.MAX_MISMATCHES)
+
+    def classify(self, question: str) -> RouteDecision:
+        """Score how safely a question can be answered locally"""
+        intent = self.formatter.lookup_intent(question)
+        locations = tuple(self.weather_tool.extract_locations(question))
+
+        if intent is None or not locations:
+            return RouteDecision(intent, locations, 0.0, None)
+
+        # One city is a plain lookup; several usually mean a comparison
+        confidence = 0.5 if len(locations) == 1 else 0.2
+        confidence += 0.4
+        if len(question.split()) <= 12:
+            confidence += 0.1
+
+        reports = [self.weather_tool.get_weather_report(location) for location in locations]
+        answer = self.formatter.render_all(reports, intent)
+        return RouteDecision(intent, locations, round(confidence, 2), answer)
+
+    def route(self, question: str) -> Optional[str]:
+        """Local answer if the question clears the threshold, otherwise None"""
+        decision = self.classify(question)
+        routed = decision.answer is not None and decision.confidence >= self.threshold
+        with self._lock:
+            self.stats["routed" if routed else "passed"] += 1
+        return decision.answer if routed else None
+
+    def record_shadow(self, question: str, decision: RouteDecision, llm_answer: str) -> bool:
+        """
+        Compare a would-be local answer with the LLM's answer
+
+        They agree when the LLM answer mentions every number (temperature,
+        humidity) that the local answer states.
+
+        Returns:
+            True if the answers agree
+        """
+        local_numbers = set(_NUMBER.findall(decision.answer))
+        agreed = local_numbers <= set(_NUMBER.findall(llm_answer))
+        with self._lock:
+            if agreed:
+                self.stats["shadow_agreed"] += 1
+            else:
+                self.stats["shadow_disagreed"] += 1
+                self.shadow_mismatches.append({
+                    "question": question,
+                    "confidence": decision.confidence,
+                    "router_answer": decision.answer,
+                    "llm_answer": llm_answer,
+                })
+        return agreed
+
+    def get_stats(self) -> dict:
+        """Snapshot of routing and shadow comparison counters"""
+        with self._lock:
+            return dict(self.stats)
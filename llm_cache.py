@@ -0,0 +1,214 @@
+"""
+Persistent SQLite cache for LLM turns so restarts don't start cold
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """
+    On-disk cache of model turns keyed on the full conversation sent to the model
+
+    Covers both the function-call decision and the final text turn. The
+    store is a SQLite database in WAL mode, so several processes can share
+    one file. The most recently used entries are loaded into memory at
+    startup, and the file is compacted (least recently used entries
+    dropped) once it grows past max_bytes. Hits on the in-memory layer
+    update last_used on disk in batches.
+
+    The cache is best effort: database errors on writes (e.g. "database is
+    locked") are logged and counted, never raised to the caller, whose
+    model turn already succeeded.
+    """
+
+    # Check the on-disk size after this many writes
+    COMPACT_EVERY = 100
+    # Write last_used of memory hits to disk once this many are pending
+    TOUCH_EVERY = 64
+
+    def __init__(self, path: str, max_bytes: int = 50 * 1024 * 1024,
+                 warm_entries: int = 1000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.warm_entries = warm_entries
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # bounded in-memory layer over the file
+        self._writes = 0
+        self._touched = {}  # key -> last_used of memory hits not yet on disk
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+        # One connection guarded by a lock; the busy timeout covers other processes
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_turns ("
+            " key TEXT PRIMARY KEY,"
+            " turn TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS llm_turns_last_used ON llm_turns (last_used)"
+        )
+        self._warm_load(warm_entries)
+
+    @staticmethod
+    def make_key(model_name: str, history: list, tools: list = None) -> str:
+        """Stable hash of everything that determines the model's answer"""
+        payload = json.dumps(
+            {"model": model_name, "history": history, "tools": tools},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _warm_load(self, limit: int):
+        """Load the most recently used turns into memory"""
+        if limit <= 0:
+            return
+        rows = self._db.execute(
+            "SELECT key, turn FROM llm_turns ORDER BY last_used DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+        for key, turn in reversed(rows):
+            self._memory[key] = json.loads(turn)
+
+    def _remember(self, key: str, turn: dict):
+        if self.warm_entries <= 0:
+            return
+        self._memory[key] = turn
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.warm_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str):
+        """Return the cached turn for key, or None (unreadable entries count as misses)"""
+        with self._lock:
+            turn = self._memory.get(key)
+            if turn is None:
+                try:
+                    row = self._db.execute(
+                        "SELECT turn FROM llm_turns WHERE key = ?", (key,)
+                    ).fetchone()
+                    turn = json.loads(row[0]) if row is not None else None
+                except (sqlite3.Error, ValueError) as e:
+                    self._log_error("read a turn", e)
+                    turn = None
+                if turn is None:
+                    self.misses += 1
+                    return None
+                self._remember(key, turn)
+            else:
+                self._memory.move_to_end(key)
+            # Keep frequently used entries safe from compaction
+            self._touched[key] = time.time()
+            if len(self._touched) >= self.TOUCH_EVERY:
+                self._flush_touched()
+            self.hits += 1
+            return turn
+
+    def put(self, key: str, turn: dict):
+        """Store a model turn (database errors are logged, not raised)"""
+        data = json.dumps(turn, ensure_ascii=False)
+        with self._lock:
+            self._remember(key, turn)
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_turns (key, turn, size, last_used) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, data, len(data), time.time())
+                )
+            except sqlite3.Error as e:
+                self._log_error("store a turn", e)
+                return
+            self._writes += 1
+            if self._writes % self.COMPACT_EVERY == 0:
+                self._compact()
+
+    def compact(self):
+        """Drop least recently used entries until the store fits in max_bytes"""
+        with self._lock:
+            self._compact()
+
+    def _compact(self):
+        try:
+            self._flush_touched()
+            total = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM llm_turns"
+            ).fetchone()[0]
+            if total <= self.max_bytes:
+                return
+
+            # Shrink to 80% so compaction doesn't run on every write
+            target = int(self.max_bytes * 0.8)
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                evicted = [key for key, in self._db.execute(
+                    "SELECT key FROM ("
+                    " SELECT key, SUM(size) OVER (ORDER BY last_used DESC) AS running"
+                    " FROM llm_turns)"
+                    " WHERE running > ?",
+                    (target,)
+                )]
+                self._db.executemany(
+                    "DELETE FROM llm_turns WHERE key = ?", ((key,) for key in evicted)
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            self._log_error("compact", e)
+            return
+        for key in evicted:
+            self._memory.pop(key, None)
+
+    def _flush_touched(self):
+        """Write the last_used times of memory hits to disk"""
+        if not self._touched:
+            return
+        touched, self._touched = self._touched, {}
+        try:
+            self._db.executemany(
+                "UPDATE llm_turns SET last_used = ? WHERE key = ?",
+                ((used, key) for key, used in touched.items())
+            )
+        except sqlite3.Error as e:
+            self._log_error("update last_used", e)
+
+    def _log_error(self, action: str, error: Exception):
+        self.errors += 1
+        logger.warning("LLM cache could not %s: %s", action, error)
+
+    def stats(self) -> dict:
+        """Snapshot of cache size and hit/miss counters"""
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_turns"
+            ).fetchone()
+            return {
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+            }
+
+    def close(self):
+        """Close the underlying database connection"""
+        with self._lock:
+            self._flush_touched()
+            self._db.close()
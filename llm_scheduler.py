@@ -0,0 +1,518 @@
+"""
+Client-side admission control, retries and hedging for model calls
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from deadline import DeadlineExceeded
+from metrics import Metrics
+
+# Status codes worth retrying: timeouts, quota (429) and transient server errors
+RETRYABLE_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+def error_code(error: BaseException):
+    """HTTP-style status code of a client error (429, 503...), or None"""
+    code = getattr(error, "code", None)
+    if callable(code):  # grpc errors expose code() returning an enum
+        return None
+    try:
+        return int(code)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether an error is transient, so the same request may succeed later"""
+    if isinstance(error, DeadlineExceeded):
+        return False
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return True
+    return error_code(error) in RETRYABLE_CODES
+
+
+class TokenBucket:
+    """
+    Request-rate limiter: rate tokens per second, up to burst saved up
+
+    Callers reserve a token and sleep for as long as it takes to refill,
+    so waiters are served in arrival order without polling.
+    """
+
+    def __init__(self, rate: float, burst: int, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = clock()
+
+    def reserve(self, deadline: float = None) -> float:
+        """
+        Take one token, borrowing against the future if the bucket is empty
+
+        Returns:
+            Seconds to wait before using the token
+
+        Raises:
+            DeadlineExceeded: if the wait would end after the deadline; no
+            token is taken then
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait_for = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if deadline is not None and now + wait_for > deadline:
+                raise DeadlineExceeded("Rate limit wait exceeds the deadline")
+            self._tokens -= 1
+            return wait_for
+
+    def try_take(self) -> bool:
+        """Take a token only if one is available right now"""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class _Waiter:
+    __slots__ = ("granted", "wake")
+
+    def __init__(self, wake):
+        self.granted = False
+        self.wake = wake
+
+
+class AdaptiveLimit:
+    """
+    AIMD concurrency limit shared by threads and event loops
+
+    Each success raises the limit by about one slot per window of
+    requests (additive increase); each throttling error (429) multiplies
+    it by decrease. Waiters get freed slots in arrival order.
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = None,
+                 decrease: float = 0.5):
+        self.minimum = minimum
+        self.maximum = maximum if maximum is not None else initial
+        self.decrease = decrease
+        self.limit = float(initial)
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._waiters = deque()
+
+    def acquire(self, deadline: float = None):
+        """Wait for a slot in this thread; raises DeadlineExceeded on timeout"""
+        event = threading.Event()
+        waiter = self._enqueue(event.set)
+        if waiter is None:
+            return
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        event.wait(timeout)
+        self._settle(waiter)
+
+    async def acquire_async(self, deadline: float = None):
+        """Wait for a slot without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        waiter = self._enqueue(wake)
+        if waiter is None:
+            return
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            self._settle(waiter, cancelled=True)
+            raise
+        self._settle(waiter)
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free right now and nobody is waiting"""
+        with self._lock:
+            if self._waiters or self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, outcome: str = None):
+        """
+        Give a slot back
+
+        Args:
+            outcome: "success" grows the limit, "throttled" shrinks it,
+                anything else leaves it alone
+        """
+        with self._lock:
+            self.in_flight -= 1
+            if outcome == "success":
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            elif outcome == "throttled":
+                self.limit = max(self.minimum, self.limit * self.decrease)
+            self._wake_waiters()
+
+    def _enqueue(self, wake):
+        """Take a free slot (returns None) or queue up for one"""
+        with self._lock:
+            if not self._waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return None
+            waiter = _Waiter(wake)
+            self._waiters.append(waiter)
+            return waiter
+
+    def _settle(self, waiter: _Waiter, cancelled: bool = False):
+        """After waking or giving up: keep a granted slot or leave the queue"""
+        with self._lock:
+            if not waiter.granted:
+                self._waiters.remove(waiter)
+                if not cancelled:
+                    raise DeadlineExceeded("Timed out waiting for a model slot")
+                return
+        if cancelled:
+            self.release()
+
+    def _wake_waiters(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            self.in_flight += 1
+            waiter.wake()
+
+
+class LLMScheduler:
+    """
+    Model client wrapper that protects the API quota and hides transient errors
+
+    Wraps GeminiClient or FakeGeminiClient behind the same interface,
+    adding in order:
+
+    - a token bucket sized to the API quota (requests per minute)
+    - an AIMD concurrency limit that backs off on 429s
+    - retries of transient errors with full-jitter exponential backoff,
+      never past the request's deadline
+    - optional hedging: if a non-streaming call is still running after
+      hedge_after seconds, a second copy is sent and the first answer wins
+
+    Streaming calls are retried only until their first chunk arrives.
+    """
+
+    def __init__(self, client, metrics: Metrics = None, requests_per_minute: float = 0,
+                 burst: int = 5, max_concurrency: int = 16, max_retries: int = 3,
+                 timeout: float = 30.0, hedge_after: float = 0.0,
+                 backoff_base: float = 0.5, backoff_cap: float = 8.0, seed: int = None):
+        self.client = client
+        self.metrics = metrics if metrics is not None else Metrics(enabled=False)
+        self.bucket = TokenBucket(requests_per_minute / 60, burst) if requests_per_minute > 0 else None
+        self.limit = AdaptiveLimit(max_concurrency, maximum=max_concurrency)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._random = random.Random(seed)
+        self._hedge_pool = None
+        self._hedge_pool_lock = threading.Lock()
+        self.metrics.set_gauge("llm_concurrency_limit", self.limit.limit)
+
+    @property
+    def model_name(self) -> str:
+        return self.client.model_name
+
+    def generate(self, history: list, tools: list = None, deadline: float = None) -> dict:
+        """
+        GeminiClient.generate with admission control, retries and hedging
+
+        Args:
+            history: Conversation so far
+            tools: Function declarations the model may call
+            deadline: time.monotonic() by which the call must finish,
+                retries included; capped at timeout seconds from now
+        """
+        deadline = self._deadline(deadline)
+        for attempt in range(self.max_retries + 1):
+            self._admit(deadline)
+            try:
+                result = self._hedged(
+                    lambda: self.client.generate(history, tools=tools, timeout=self._remaining(deadline)),
+                    deadline
+                )
+            except Exception as e:
+                time.sleep(self._after_failure(e, attempt, deadline))
+                continue
+            self._after_success()
+            return result
+
+    async def generate_async(self, history: list, tools: list = None, deadline: float = None) -> dict:
+        """Async version of generate()"""
+        deadline = self._deadline(deadline)
+        for attempt in range(self.max_retries + 1):
+            await self._admit_async(deadline)
+            try:
+                result = await self._hedged_async(
+                    lambda: asyncio.wait_for(
+                        self.client.generate_async(history, tools=tools, timeout=self._remaining(deadline)),
+                        self._remaining(deadline)
+                    ),
+                    deadline
+                )
+            except asyncio.CancelledError:
+                self.limit.release()
+                raise
+            except Exception as e:
+                await asyncio.sleep(self._after_failure(e, attempt, deadline))
+                continue
+            self._after_success()
+            return result
+
+    def stream(self, history: list, tools: list = None, deadline: float = None):
+        """GeminiClient.stream with admission control and retries before the first chunk"""
+        deadline = self._deadline(deadline)
+        for attempt in range(self.max_retries + 1):
+            self._admit(deadline)
+            started = False
+            outcome = None
+            try:
+                for chunk in self.client.stream(history, tools=tools, timeout=self._remaining(deadline)):
+                    started = True
+                    yield chunk
+                outcome = "success"
+            except Exception as e:
+                outcome = "failed"
+                if started:
+                    self._release_after_error(e)
+                    if time.monotonic() >= deadline:
+                        raise DeadlineExceeded("Model stream deadline exceeded") from e
+                    raise
+                time.sleep(self._after_failure(e, attempt, deadline))
+                continue
+            finally:
+                if outcome is None:  # consumer closed the stream early
+                    self.limit.release()
+            self._after_success()
+            return
+
+    async def stream_async(self, history: list, tools: list = None, deadline: float = None):
+        """Async version of stream()"""
+        deadline = self._deadline(deadline)
+        for attempt in range(self.max_retries + 1):
+            await self._admit_async(deadline)
+            started = False
+            outcome = None
+            try:
+                chunks = self.client.stream_async(history, tools=tools, timeout=self._remaining(deadline))
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), self._remaining(deadline))
+                    except StopAsyncIteration:
+                        break
+                    started = True
+                    yield chunk
+                outcome = "success"
+            except Exception as e:
+                outcome = "failed"
+                if started:
+                    self._release_after_error(e)
+                    if time.monotonic() >= deadline:
+                        raise DeadlineExceeded("Model stream deadline exceeded") from e
+                    raise
+                await asyncio.sleep(self._after_failure(e, attempt, deadline))
+                continue
+            finally:
+                if outcome is None:  # cancelled or closed early
+                    self.limit.release()
+            self._after_success()
+            return
+
+    def get_stats(self) -> dict:
+        """Current concurrency limit and slots in use"""
+        return {"concurrency_limit": round(self.limit.limit, 2), "in_flight": self.limit.in_flight}
+
+    def _deadline(self, deadline: float) -> float:
+        """Absolute time.monotonic() deadline for a call: the request's, or sooner"""
+        own = time.monotonic() + self.timeout
+        return own if deadline is None else min(deadline, own)
+
+    @staticmethod
+    def _remaining(deadline: float) -> float:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("Model request deadline exceeded")
+        return remaining
+
+    def _admit(self, deadline: float):
+        """Wait for a rate-limit token and a concurrency slot"""
+        if self.bucket is not None:
+            with self.metrics.span("llm_rate_limit_wait"):
+                delay = self._reserve(deadline)
+                if delay:
+                    time.sleep(delay)
+        with self.metrics.span("llm_concurrency_wait"):
+            try:
+                self.limit.acquire(deadline)
+            except DeadlineExceeded:
+                self.metrics.incr("llm_deadline_exceeded")
+                raise
+        self.metrics.incr("llm_attempts")
+
+    async def _admit_async(self, deadline: float):
+        if self.bucket is not None:
+            with self.metrics.span("llm_rate_limit_wait"):
+                delay = self._reserve(deadline)
+                if delay:
+                    await asyncio.sleep(delay)
+        with self.metrics.span("llm_concurrency_wait"):
+            try:
+                await self.limit.acquire_async(deadline)
+            except DeadlineExceeded:
+                self.metrics.incr("llm_deadline_exceeded")
+                raise
+        self.metrics.incr("llm_attempts")
+
+    def _reserve(self, deadline: float) -> float:
+        try:
+            return self.bucket.reserve(deadline)
+        except DeadlineExceeded:
+            self.metrics.incr("llm_deadline_exceeded")
+            raise
+
+    def _after_success(self):
+        self.limit.release("success")
+        self.metrics.set_gauge("llm_concurrency_limit", self.limit.limit)
+
+    def _release_after_error(self, error: BaseException):
+        throttled = error_code(error) == 429
+        if throttled:
+            self.metrics.incr("llm_throttled")
+        self.limit.release("throttled" if throttled else None)
+        self.metrics.set_gauge("llm_concurrency_limit", self.limit.limit)
+
+    def _after_failure(self, error: Exception, attempt: int, deadline: float) -> float:
+        """
+        Release the slot of a failed attempt and decide whether to retry
+
+        Returns:
+            Seconds to sleep before the next attempt; re-raises the error
+            when it is permanent, retries are used up, or the deadline is
+            too close
+        """
+        self._release_after_error(error)
+        if isinstance(error, DeadlineExceeded):
+            self.metrics.incr("llm_deadline_exceeded")
+            raise error
+        if isinstance(error, (TimeoutError, asyncio.TimeoutError)) and time.monotonic() >= deadline:
+            # The call's timeout was the remaining budget; report it as such
+            self.metrics.incr("llm_deadline_exceeded")
+            raise DeadlineExceeded("Model request deadline exceeded") from error
+        if not is_retryable(error):
+            self.metrics.incr("llm_failures")
+            raise error
+        if attempt >= self.max_retries:
+            self.metrics.incr("llm_retries_exhausted")
+            raise error
+        delay = self._random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            self.metrics.incr("llm_deadline_exceeded")
+            raise DeadlineExceeded("Model request deadline exceeded while retrying") from error
+        self.metrics.incr("llm_retries")
+        return delay
+
+    def _admit_hedge(self) -> bool:
+        """
+        Take a concurrency slot and a rate-limit token for a hedge, without waiting
+
+        Hedges are extra requests, so they count against both limits. The
+        slot is given back when the hedge finishes (see _hedge_done).
+        """
+        if not self.limit.try_acquire():
+            return False
+        if self.bucket is not None and not self.bucket.try_take():
+            self.limit.release()
+            return False
+        self.metrics.incr("llm_hedges")
+        return True
+
+    def _hedge_done(self, future):
+        self.limit.release()
+
+    def _hedge_winner(self, done: set, pending: set, hedge):
+        """A successful finished call (or the last failure once nothing is pending), else None"""
+        winner = next((future for future in done if future.exception() is None), None)
+        if winner is None and not pending:
+            winner = done.pop()
+        if winner is hedge:
+            self.metrics.incr("llm_hedge_wins")
+        return winner
+
+    def _hedged(self, call, deadline: float):
+        """Run call(), adding a second copy if it is slow to answer"""
+        if not self.hedge_after:
+            return call()
+        pool = self._hedge_executor()
+        first_wait = min(self.hedge_after, self._remaining(deadline))
+        primary = pool.submit(call)
+        done, _ = wait([primary], timeout=first_wait)
+        if done or not self._admit_hedge():
+            try:
+                return primary.result(timeout=self._remaining(deadline))
+            except FutureTimeoutError:
+                raise DeadlineExceeded("Model request deadline exceeded") from None
+
+        hedge = pool.submit(call)
+        hedge.add_done_callback(self._hedge_done)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, timeout=self._remaining(deadline),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceeded("Model request deadline exceeded")
+            winner = self._hedge_winner(done, pending, hedge)
+            if winner is not None:
+                return winner.result()
+
+    async def _hedged_async(self, call, deadline: float):
+        if not self.hedge_after:
+            return await call()
+        first_wait = min(self.hedge_after, self._remaining(deadline))
+        primary = asyncio.ensure_future(call())
+        done, _ = await asyncio.wait({primary}, timeout=first_wait)
+        if done or not self._admit_hedge():
+            return await primary
+
+        hedge = asyncio.ensure_future(call())
+        hedge.add_done_callback(self._hedge_done)
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = self._hedge_winner(done, pending, hedge)
+                if winner is not None:
+                    return winner.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _hedge_executor(self) -> ThreadPoolExecutor:
+        with self._hedge_pool_lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(
+                    max_workers=2 * int(self.limit.maximum), thread_name_prefix="llm-hedge"
+                )
+            return self._hedge_pool
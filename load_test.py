@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Load generator for the Weather Agent
+
+Replays a question corpus against the async agent API, either closed-loop
+(a fixed number of concurrent users) or open-loop (a target request rate),
+and reports latency percentiles, throughput and error rate.
+
+  # 50 concurrent users against the offline fake model, for 30 seconds
+  python load_test.py questions.jsonl --fake --concurrency 50 --duration 30
+
+  # 20 questions per second with 2% injected model errors
+  python load_test.py questions.jsonl --fake --qps 20 --error-rate 0.02
+
+Without --fake, the agent uses whatever backend Config selects (Gemini
+with GOOGLE_API_KEY, otherwise mock mode).
+
+Identical questions in flight are coalesced as WEATHER_AGENT_COALESCE says
+unless --coalesce or --no-coalesce is given; with --no-coalesce every
+request does its own work. The report shows how many shared one.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import sys
+import time
+
+from fake_gemini import FakeGeminiClient
+from weather_agent import WeatherAgent
+
+SAMPLE_QUESTIONS = [
+    "What's the weather in London?",
+    "How hot is it in Tokyo?",
+    "Is it humid in New York?",
+    "What's the temperature in Paris?",
+    "How's the weather in San Francisco?",
+    "Compare the weather in London and Paris",
+    "Should I take an umbrella in London today?",
+    "What's the weather like in Miami?",
+]
+
+
+def load_questions(path: str, field: str) -> list:
+    """
+    Read questions from a JSONL file (one object per line, question in
+    field) or a plain text file (one question per line)
+    """
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                questions.append(line)
+                continue
+            if isinstance(record, dict) and record.get(field):
+                questions.append(str(record[field]))
+    return questions
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(q * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+class LoadGenerator:
+    """
+    Drives an agent with a question corpus and records per-request results
+
+    Latency is measured from the moment a request was due, so in open-loop
+    mode time spent queuing behind a saturated agent counts against it.
+    """
+
+    def __init__(self, agent: WeatherAgent, questions: list, use_cache: bool = False):
+        self.agent = agent
+        self.questions = questions
+        self.use_cache = use_cache
+        self.results = []  # (latency seconds, first token seconds or None, ok)
+
+    async def run_closed(self, concurrency: int, requests: int = None, duration: float = None):
+        """Run concurrency users that each send their next question as soon as one is answered"""
+        questions = itertools.cycle(self.questions)
+        counter = itertools.count()
+        deadline = time.perf_counter() + duration if duration else None
+
+        async def user():
+            while True:
+                if requests is not None and next(counter) >= requests:
+                    return
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return
+                await self._ask(next(questions), time.perf_counter())
+
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+
+    async def run_open(self, qps: float, requests: int = None, duration: float = None):
+        """Start questions at a fixed rate, whether or not earlier ones have finished"""
+        questions = itertools.cycle(self.questions)
+        tasks = set()
+        start = time.perf_counter()
+        for i in itertools.count():
+            due = start + i / qps
+            if requests is not None and i >= requests:
+                break
+            if duration is not None and due - start >= duration:
+                break
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.ensure_future(self._ask(next(questions), due))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def _ask(self, question: str, due: float):
+        first_token = None
+        ok = False
+        try:
+            async for event in self.agent.answer_question_stream_async(question, use_cache=self.use_cache):
+                if event["type"] == "token" and first_token is None:
+                    first_token = time.perf_counter() - due
+                elif event["type"] == "done":
+                    ok = True
+        except Exception:
+            ok = False
+        self.results.append((time.perf_counter() - due, first_token, ok))
+
+    def report(self, elapsed: float) -> dict:
+        """Summarize the recorded results"""
+        latencies = sorted(r[0] for r in self.results)
+        first_tokens = sorted(r[1] for r in self.results if r[1] is not None)
+        errors = sum(1 for r in self.results if not r[2])
+        count = len(self.results)
+
+        def summary(values):
+            return {
+                "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+                "max_ms": round(values[-1] * 1000, 1) if values else 0.0,
+            }
+
+        return {
+            "requests": count,
+            "errors": errors,
+            "error_rate": round(errors / count, 4) if count else 0.0,
+            "elapsed_s": round(elapsed, 2),
+            "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+            "latency": summary(latencies),
+            "first_token": summary(first_tokens),
+        }
+
+
+def print_report(report: dict, out=sys.stderr):
+    latency, first = report["latency"], report["first_token"]
+    print(f"📈 {report['requests']} requests in {report['elapsed_s']}s "
+          f"({report['throughput_rps']} req/s), "
+          f"{report['errors']} errors ({report['error_rate']:.2%})", file=out)
+    print(f"   latency      p50 {latency['p50_ms']} ms  p95 {latency['p95_ms']} ms  "
+          f"p99 {latency['p99_ms']} ms  max {latency['max_ms']} ms", file=out)
+    print(f"   first token  p50 {first['p50_ms']} ms  p95 {first['p95_ms']} ms  "
+          f"p99 {first['p99_ms']} ms", file=out)
+    questions = report["coalescing"]["questions"]
+    print(f"   coalescing   {questions['coalesced']} questions joined {questions['leaders']} "
+          f"leaders, {questions['left']} stopped waiting", file=out)
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Load-test the Weather Agent")
+    parser.add_argument("corpus", nargs="?",
+                        help="JSONL or text file of questions (default: built-in samples)")
+    parser.add_argument("--field", default="question",
+                        help="JSON field holding the question text")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("-c", "--concurrency", type=int, default=10,
+                      help="Concurrent users in closed-loop mode (default: 10)")
+    mode.add_argument("--qps", type=float,
+                      help="Target request rate; switches to open-loop mode")
+    parser.add_argument("-n", "--requests", type=int,
+                        help="Stop after this many requests")
+    parser.add_argument("-d", "--duration", type=float,
+                        help="Stop after this many seconds (default: 10 unless -n is given)")
+    parser.add_argument("--use-cache", action="store_true",
+                        help="Let repeated questions hit the answer cache")
+    parser.add_argument("--coalesce", action=argparse.BooleanOptionalAction, default=None,
+                        help="Let identical in-flight questions and tool calls share one computation "
+                             "(default: WEATHER_AGENT_COALESCE)")
+    parser.add_argument("--coalesce-wait-ms", type=float,
+                        help="Longest a coalesced question waits on its leader "
+                             "(default: WEATHER_AGENT_COALESCE_WAIT_MS)")
+    parser.add_argument("--json", help="Also write the report as JSON to this file")
+
+    fake = parser.add_argument_group("fake model (offline)")
+    fake.add_argument("--fake", action="store_true",
+                      help="Use FakeGeminiClient instead of the configured backend")
+    fake.add_argument("--latency-ms", type=float, default=300.0,
+                      help="Median latency of one model turn (default: 300)")
+    fake.add_argument("--distribution", choices=FakeGeminiClient.DISTRIBUTIONS,
+                      default="lognormal", help="Latency distribution (default: lognormal)")
+    fake.add_argument("--jitter", type=float, default=0.3,
+                      help="Lognormal sigma (default: 0.3)")
+    fake.add_argument("--error-rate", type=float, default=0.0,
+                      help="Fraction of model turns that fail")
+    fake.add_argument("--error-codes", default="429,500,503",
+                      help="Status codes of injected errors (default: 429,500,503)")
+    fake.add_argument("--slow-rate", type=float, default=0.0,
+                      help="Fraction of model turns that are very slow")
+    fake.add_argument("--slow-ms", type=float, default=10000.0,
+                      help="Latency of a slow turn (default: 10000)")
+    fake.add_argument("--tool-mode", choices=FakeGeminiClient.TOOL_MODES, default="auto",
+                      help="When the fake model calls get_weather (default: auto)")
+    fake.add_argument("--seed", type=int, help="Seed for reproducible runs")
+    args = parser.parse_args()
+
+    questions = load_questions(args.corpus, args.field) if args.corpus else SAMPLE_QUESTIONS
+    if not questions:
+        parser.error(f"no questions found in {args.corpus}")
+    duration = args.duration
+    if duration is None and args.requests is None:
+        duration = 10.0
+
+    # Agent setup messages are logged to stderr, so stdout stays clean
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    client = None
+    if args.fake:
+        client = FakeGeminiClient(
+            latency_ms=args.latency_ms, distribution=args.distribution,
+            jitter=args.jitter, error_rate=args.error_rate,
+            error_codes=[int(code) for code in args.error_codes.split(",") if code],
+            slow_rate=args.slow_rate, slow_ms=args.slow_ms,
+            tool_mode=args.tool_mode, seed=args.seed,
+        )
+    agent = WeatherAgent(client=client)
+    if args.fake:
+        client.weather_tool = agent.weather_tool
+    if args.coalesce is not None:
+        agent.config.coalesce_requests = args.coalesce
+    if args.coalesce_wait_ms is not None:
+        agent.config.coalesce_wait_ms = args.coalesce_wait_ms
+    generator = LoadGenerator(agent, questions, use_cache=args.use_cache)
+
+    if args.qps:
+        print(f"🚀 Open loop at {args.qps} req/s", file=sys.stderr)
+        run = generator.run_open(args.qps, args.requests, duration)
+    else:
+        print(f"🚀 Closed loop with {args.concurrency} concurrent users", file=sys.stderr)
+        run = generator.run_closed(args.concurrency, args.requests, duration)
+
+    started = time.perf_counter()
+    asyncio.run(run)
+    report = generator.report(time.perf_counter() - started)
+    report["coalescing"] = agent.coalescing_stats()
+    if args.fake:
+        report["fake_model"] = client.get_stats()
+    if not agent.use_mock:
+        report["scheduler"] = agent.client.get_stats()
+        report["final_answers"] = agent.final_answer_stats()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
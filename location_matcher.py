@@ -0,0 +1,180 @@
+"""
+Aho-Corasick matcher that finds known city names in a question
+"""
+
+import zlib
+from array import array
+
+from city_store import normalize_name
+
+# Multiplier used to spread node ids over the transition table
+_NODE_MIX = 2654435761
+
+
+def _word_hash(word: str) -> int:
+    return zlib.crc32(word.encode("utf-8"))
+
+
+class LocationMatcher:
+    """
+    Word-level Aho-Corasick automaton over normalized city names and aliases
+
+    Patterns are sequences of words, so matches always fall on word
+    boundaries ("in" never matches inside "raining"). A single pass over
+    the question finds every mentioned name; overlapping matches are
+    resolved leftmost-longest ("new york city" beats "new york").
+
+    To stay small with hundreds of thousands of names, the automaton lives
+    in flat arrays: words are reduced to crc32 ids and transitions are an
+    open-addressing table keyed by (node, word id). A hash collision could
+    only produce a false match, so matches are confirmed with the optional
+    contains() callback (normally the city index lookup).
+
+    Building the automaton takes seconds for a large city table, so
+    CityStore.build saves its arrays (sections()) in the database file and
+    from_sections() reopens them from the mmap without any work.
+    """
+
+    def __init__(self, names, contains=None):
+        self._contains = contains
+        self._mask = 1023
+        self._edge_keys = array("Q", bytes(8 * 1024))
+        self._edge_child = array("I", bytes(4 * 1024))  # 0 marks an empty slot
+        self._edges = 0
+        self._fail = array("I", [0])
+        self._length = array("H", [0])  # words in the name ending here, 0 if none
+        self._output = array("I", [0])  # nearest proper suffix that is a name
+        depth = array("H", [0])
+
+        for name in names:
+            node = 0
+            words = name.split()
+            for word in words:
+                word_id = _word_hash(word)
+                child = self._child(node, word_id)
+                if not child:
+                    child = len(self._fail)
+                    self._add_edge(node, word_id, child)
+                    self._fail.append(0)
+                    self._length.append(0)
+                    self._output.append(0)
+                    depth.append(depth[node] + 1)
+                node = child
+            if words:
+                self._length[node] = len(words)
+
+        # Failure links level by level: a node's parent and its failure
+        # target are always shallower, so they're already done
+        levels = [array("I") for _ in range(max(depth) + 1)]
+        for slot in range(self._mask + 1):
+            child = self._edge_child[slot]
+            if child:
+                levels[depth[child]].append(slot)
+
+        for level in levels[2:]:
+            for slot in level:
+                key = self._edge_keys[slot]
+                child = self._edge_child[slot]
+                parent, word_id = key >> 32, key & 0xFFFFFFFF
+                state = self._fail[parent]
+                target = self._child(state, word_id)
+                while not target and state:
+                    state = self._fail[state]
+                    target = self._child(state, word_id)
+                self._fail[child] = target
+                self._output[child] = target if self._length[target] else self._output[target]
+
+    @classmethod
+    def from_sections(cls, edge_keys, edge_child, fail, length, output, contains=None):
+        """
+        Matcher over arrays saved from sections(), e.g. memoryviews into a city database
+
+        The matcher is read-only; the arrays are used as they are, not copied.
+        """
+        matcher = cls.__new__(cls)
+        matcher._contains = contains
+        matcher._mask = len(edge_child) - 1
+        matcher._edge_keys = edge_keys
+        matcher._edge_child = edge_child
+        matcher._edges = None
+        matcher._fail = fail
+        matcher._length = length
+        matcher._output = output
+        return matcher
+
+    def sections(self) -> tuple:
+        """The automaton arrays: edge keys (Q), edge children (I), fail (I), length (H), output (I)"""
+        return self._edge_keys, self._edge_child, self._fail, self._length, self._output
+
+    def _child(self, node: int, word_id: int) -> int:
+        """Transition from node on a word, or 0 if there is none"""
+        key = (node << 32) | word_id
+        mask = self._mask
+        i = ((node * _NODE_MIX) ^ word_id) & mask
+        while True:
+            child = self._edge_child[i]
+            if not child or self._edge_keys[i] == key:
+                return child
+            i = (i + 1) & mask
+
+    def _add_edge(self, node: int, word_id: int, child: int):
+        if (self._edges + 1) * 2 > self._mask + 1:
+            self._grow()
+        self._insert(node, word_id, child)
+        self._edges += 1
+
+    def _insert(self, node: int, word_id: int, child: int):
+        mask = self._mask
+        i = ((node * _NODE_MIX) ^ word_id) & mask
+        while self._edge_child[i]:
+            i = (i + 1) & mask
+        self._edge_keys[i] = (node << 32) | word_id
+        self._edge_child[i] = child
+
+    def _grow(self):
+        keys, children = self._edge_keys, self._edge_child
+        size = (self._mask + 1) * 2
+        self._mask = size - 1
+        self._edge_keys = array("Q", bytes(8 * size))
+        self._edge_child = array("I", bytes(4 * size))
+        for key, child in zip(keys, children):
+            if child:
+                self._insert(key >> 32, key & 0xFFFFFFFF, child)
+
+    def find_all(self, question: str) -> list:
+        """
+        Find every known name mentioned in a question
+
+        Returns:
+            Normalized names in order of appearance, without overlaps
+        """
+        words = normalize_name(question).split()
+        fail = self._fail
+        length = self._length
+        output = self._output
+
+        matches = []  # (start, -words) so sorting puts longer matches first
+        state = 0
+        for end, word in enumerate(words, 1):
+            word_id = _word_hash(word)
+            target = self._child(state, word_id)
+            while not target and state:
+                state = fail[state]
+                target = self._child(state, word_id)
+            state = target
+
+            node = state if length[state] else output[state]
+            while node:
+                matches.append((end - length[node], -length[node]))
+                node = output[node]
+
+        found = []
+        covered = 0
+        for start, neg_size in sorted(matches):
+            if start < covered:
+                continue
+            name = " ".join(words[start:start - neg_size])
+            if self._contains is None or self._contains(name):
+                covered = start - neg_size
+                found.append(name)
+        return found
@@ -3,6 +3,8 @@
 Simple Weather Agent with LLM Function Calling
 """
 
+import logging
+
 from weather_agent import WeatherAgent
 
 
@@ -11,6 +13,7 @@ class WeatherApp:
     
     def __init__(self):
         self.agent = None
+        self.conversation = None
     
     def initialize(self):
         """Initialize the weather agent"""
@@ -20,6 +23,7 @@ class WeatherApp:
         
         try:
             self.agent = WeatherAgent()
+            self.conversation = self.agent.new_conversation()
             print("✅ Agent initialized successfully!")
             return True
         except Exception as e:
@@ -33,8 +37,47 @@ class WeatherApp:
         print("  - 'What's the weather in London?'")
         print("  - 'How hot is it in Tokyo?'") 
         print("  - 'Is it humid in New York?'")
+        print("  - 'And how hot is it there?' (follow-up questions remember the conversation)")
+        print("Type '/new' to start a new conversation.")
+        if self.agent.metrics.enabled:
+            print("Type '/metrics' to see per-stage latencies.")
         print("Type 'quit' to exit.\n")
     
+    def show_answer(self, question: str):
+        """Print the agent's answer incrementally as it streams in"""
+        with self.agent.metrics.span("cli_turn"):
+            self._print_events(question)
+    
+    def _print_events(self, question: str):
+        """Print each streamed event of one answer"""
+        started = False
+        for event in self.agent.answer_question_stream(question, conversation=self.conversation):
+            if event["type"] == "tool_call":
+                args = ", ".join(f"{k}='{v}'" for k, v in event["args"].items())
+                if self.agent.use_mock:
+                    print(f"🔧 [Mock] LLM is calling: {event['name']}({args})")
+                else:
+                    print(f"🔧 Calling {event['name']}({args})")
+            elif event["type"] == "tool_result" and self.agent.use_mock:
+                print(f"🔧 [Mock] Tool returned: {event['response'].get('result')} "
+                      f"({event['elapsed_ms']} ms)")
+            elif event["type"] == "token":
+                if not started:
+                    print("🤖 Agent: ", end="", flush=True)
+                    started = True
+                print(event["text"], end="", flush=True)
+            elif event["type"] in ("done", "error"):
+                if not started:
+                    print(f"🤖 Agent: {event['text']}", end="")
+                print("\n")
+    
+    def show_metrics(self):
+        """Print the agent's metrics in the Prometheus text format"""
+        if not self.agent.metrics.enabled:
+            print("📊 Metrics are disabled. Set WEATHER_AGENT_METRICS=1 to enable them.\n")
+            return
+        print(self.agent.metrics.to_prometheus())
+    
     def run(self):
         """Run the main chat loop"""
         if not self.initialize():
@@ -56,13 +99,21 @@ class WeatherApp:
                 if not question:
                     continue
                 
-                print("🤔 LLM is thinking...")
+                # Show collected latency metrics
+                if question.lower() == '/metrics':
+                    self.show_metrics()
+                    continue
                 
-                # Get answer from LLM agent
-                answer = self.agent.answer_question(question)
+                # Forget earlier turns
+                if question.lower() == '/new':
+                    self.conversation.clear()
+                    print("🧹 Started a new conversation.\n")
+                    continue
+                
+                print("🤔 LLM is thinking...")
                 
-                # Show response
-                print(f"🤖 Agent: {answer}\n")
+                # Stream the answer from the LLM agent as it is generated
+                self.show_answer(question)
                 
             except KeyboardInterrupt:
                 print("\nGoodbye! 👋")
@@ -73,6 +124,8 @@ class WeatherApp:
 
 def main():
     """Main function"""
+    # Agent setup messages (which LLM backend is in use) go to stderr
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     app = WeatherApp()
     app.run()
 
@@ -0,0 +1,185 @@
+"""
+Lightweight per-stage latency metrics for the Weather Agent pipeline
+"""
+
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+# Shared no-op span so disabled metrics cost one attribute check per stage
+_NULL_SPAN = nullcontext()
+
+
+class Metrics:
+    """
+    Thread-safe counters, gauges and latency histograms with pluggable exporters
+
+    Stages are timed with span(); every finished span is added to the
+    stage's histogram and handed to any registered sinks (see
+    JsonLogSink). Read the data back with snapshot() or to_prometheus().
+    When disabled, span() returns a shared no-op context manager and
+    incr()/observe() return immediately.
+    """
+
+    # Histogram bucket upper bounds, in seconds
+    BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+               0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}  # stage -> [bucket counts..., +Inf count]
+        self._sums = {}  # stage -> total seconds
+        self._sinks = []
+
+    def span(self, stage: str):
+        """Context manager that times one pipeline stage"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage)
+
+    def incr(self, name: str, value: int = 1):
+        """Increase a counter"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float):
+        """Record the current value of something that goes up and down"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, stage: str, seconds: float):
+        """Record one stage duration"""
+        if not self.enabled:
+            return
+        with self._lock:
+            buckets = self._histograms.get(stage)
+            if buckets is None:
+                buckets = self._histograms[stage] = [0] * (len(self.BUCKETS) + 1)
+                self._sums[stage] = 0.0
+            buckets[bisect_left(self.BUCKETS, seconds)] += 1
+            self._sums[stage] += seconds
+            sinks = self._sinks
+
+        for sink in sinks:
+            sink({"stage": stage, "seconds": seconds})
+
+    def add_sink(self, sink):
+        """Register a callable that receives every finished span as a dict"""
+        with self._lock:
+            self._sinks = self._sinks + [sink]
+
+    def reset(self):
+        """Clear all counters and histograms"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+            self._sums.clear()
+
+    def snapshot(self) -> dict:
+        """
+        In-process view of all metrics
+
+        Returns:
+            {"counters": {name: value},
+             "gauges": {name: value},
+             "stages": {stage: {"count", "sum", "mean", "p50", "p95", "p99", "buckets"}}}
+            Percentiles are bucket upper bounds, so they are approximate.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {stage: list(b) for stage, b in self._histograms.items()}
+            sums = dict(self._sums)
+
+        stages = {}
+        for stage, buckets in histograms.items():
+            count = sum(buckets)
+            stages[stage] = {
+                "count": count,
+                "sum": sums[stage],
+                "mean": sums[stage] / count if count else 0.0,
+                "p50": self._quantile(buckets, count, 0.50),
+                "p95": self._quantile(buckets, count, 0.95),
+                "p99": self._quantile(buckets, count, 0.99),
+                "buckets": dict(zip([str(b) for b in self.BUCKETS] + ["+Inf"], buckets)),
+            }
+        return {"counters": counters, "gauges": gauges, "stages": stages}
+
+    def _quantile(self, buckets: list, count: int, q: float) -> float:
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for bound, n in zip(self.BUCKETS + (float("inf"),), buckets):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def to_prometheus(self, prefix: str = "weather_agent") -> str:
+        """Dump all metrics in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot["counters"].items()):
+            metric = f"{prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        for name, value in sorted(snapshot["gauges"].items()):
+            metric = f"{prefix}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+
+        if snapshot["stages"]:
+            metric = f"{prefix}_stage_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for stage, data in sorted(snapshot["stages"].items()):
+                cumulative = 0
+                for bound, n in data["buckets"].items():
+                    cumulative += n
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {data["sum"]}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {data["count"]}')
+        return "\n".join(lines) + "\n"
+
+
+class _Span:
+    __slots__ = ("_metrics", "_stage", "_start")
+
+    def __init__(self, metrics: Metrics, stage: str):
+        self._metrics = metrics
+        self._stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._metrics.observe(self._stage, time.perf_counter() - self._start)
+        return False
+
+
+class JsonLogSink:
+    """Metrics sink that appends every span as a JSON line to a file or stream"""
+
+    def __init__(self, target):
+        self._lock = threading.Lock()
+        if isinstance(target, str):
+            self._stream = open(target, "a", encoding="utf-8")
+        else:
+            self._stream = target
+
+    def __call__(self, record: dict):
+        line = json.dumps({"ts": time.time(), **record})
+        with self._lock:
+            self._stream.write(line + "\n")
+            self._stream.flush()
@@ -0,0 +1,77 @@
+"""
+Template-based answers for simple weather lookups
+"""
+
+import re
+
+from weather_report import WeatherReport
+
+_WORDS = re.compile(r"[a-z]+")
+
+
+def _mentions(words: set, stems: tuple) -> bool:
+    """True if any word starts with one of the stems"""
+    return any(word.startswith(stems) for word in words)
+
+
+class ResponseFormatter:
+    """Renders weather reports as natural sentences without an LLM"""
+
+    TEMPLATES = {
+        "temperature": "The current temperature in {location} is {temperature}°C.",
+        "humidity": "The humidity in {location} is {humidity}%.",
+        "conditions": "The weather in {location} is currently {conditions} with a temperature of {temperature}°C.",
+    }
+
+    # Word beginnings that signal which reading the user asked about, so
+    # inflected forms match too ("temps", "hotter", "humidity's", "rained")
+    INTENT_STEMS = {
+        "temperature": ("temp", "hot", "cold", "warm", "degree"),
+        "humidity": ("humid", "muggy"),
+        "conditions": ("weather", "condition", "like", "outside", "sunny", "cloud", "rain", "clear"),
+    }
+
+    # Words that mean the question needs reasoning, not just a reading
+    COMPLEX_KEYWORDS = {
+        "compare", "comparison", "difference", "than", "which", "best", "should",
+        "why", "explain", "recommend", "wear", "umbrella", "pack",
+        "tomorrow", "forecast", "week", "weekend", "later", "tonight", "yesterday",
+        "history", "average", "if", "plan", "trip",
+    }
+
+    def detect_intent(self, question: str) -> str:
+        """Best-guess intent for a question, defaulting to general conditions"""
+        words = set(_WORDS.findall(question.lower()))
+        if _mentions(words, self.INTENT_STEMS["temperature"]):
+            return "temperature"
+        if _mentions(words, self.INTENT_STEMS["humidity"]):
+            return "humidity"
+        return "conditions"
+
+    def lookup_intent(self, question: str):
+        """
+        Intent of a question that is a plain reading lookup
+
+        Returns:
+            "temperature", "humidity" or "conditions", or None if the
+            question needs real language generation
+        """
+        words = set(_WORDS.findall(question.lower()))
+        if words & self.COMPLEX_KEYWORDS:
+            return None
+        if not any(_mentions(words, stems) for stems in self.INTENT_STEMS.values()):
+            return None
+        return self.detect_intent(question)
+
+    def render(self, report: WeatherReport, intent: str) -> str:
+        """Fill the template for one report"""
+        return self.TEMPLATES[intent].format(
+            location=report.location,
+            temperature=report.temperature,
+            humidity=report.humidity,
+            conditions=report.description.lower(),
+        )
+
+    def render_all(self, reports: list, intent: str) -> str:
+        """Fill the template for each report and join the sentences"""
+        return " ".join(self.render(report, intent) for report in reports)
@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+"""
+JSON-over-HTTP server for the Weather Agent
+
+  python server.py --port 8080                  # mock mode without an API key
+  python server.py --fake --latency-ms 300      # offline fake model
+  python server.py --workers 4                  # four processes, one socket
+
+  curl -s localhost:8080/question -d '{"question": "How hot is it in Tokyo?"}'
+  curl -s localhost:8080/batch -d '{"questions": ["Weather in London?", "Humid in Paris?"]}'
+
+Endpoints:
+  POST /question  {"question": ..., "timeout": seconds (optional)}
+  POST /batch     {"questions": [...], "timeout": seconds (optional)}
+  GET  /healthz   200 while serving, 503 while draining
+  GET  /metrics   Prometheus text (with WEATHER_AGENT_METRICS=1)
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+from http import HTTPStatus
+
+from deadline import Deadline
+from fake_gemini import FakeGeminiClient
+from weather_agent import WeatherAgent
+
+# Largest request body accepted
+MAX_BODY_BYTES = 1024 * 1024
+
+# Seconds a client gets to send the body once the headers are in
+BODY_TIMEOUT = 1.0
+
+# Most header lines accepted in one request
+MAX_HEADERS = 100
+
+
+class HttpError(Exception):
+    """A request that gets an error response instead of reaching the agent"""
+
+    def __init__(self, status: int, message: str, headers: dict = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class WeatherServer:
+    """
+    Minimal asyncio HTTP/1.1 server in front of one WeatherAgent
+
+    Connections are kept alive between requests. Questions go through a
+    bounded queue served by a fixed number of worker tasks; when the queue
+    is full, requests are turned away with 503 right away instead of piling
+    up. drain() stops accepting connections, lets queued and running
+    questions finish, and closes idle connections.
+    """
+
+    def __init__(self, agent: WeatherAgent, concurrency: int = None, queue_size: int = 64,
+                 max_batch: int = 100, keep_alive_timeout: float = 15.0,
+                 drain_timeout: float = 30.0):
+        self.agent = agent
+        self.concurrency = max(1, concurrency or agent.config.max_concurrent_requests)
+        self.queue_size = queue_size
+        self.max_batch = max_batch
+        self.keep_alive_timeout = keep_alive_timeout
+        self.drain_timeout = drain_timeout
+        self.draining = False
+        self._queue = None
+        self._server = None
+        self._workers = []
+        self._connections = set()  # connection handler tasks
+        self._idle = set()  # writers of connections waiting for a request
+        self._stopped = None
+        self.stats = {"requests": 0, "rejected": 0, "connections": 0}
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8080, sock: socket.socket = None):
+        """Serve until SIGTERM or SIGINT, then drain"""
+        self._queue = asyncio.Queue(self.queue_size)
+        self._stopped = asyncio.Event()
+        self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.concurrency)]
+        if sock is not None:
+            self._server = await asyncio.start_server(self._handle_connection, sock=sock)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host, port)
+
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, self._stopped.set)
+        address = self._server.sockets[0].getsockname()
+        print(f"🌐 Serving on http://{address[0]}:{address[1]} (pid {os.getpid()}, "
+              f"concurrency {self.concurrency}, queue {self.queue_size})", file=sys.stderr)
+
+        await self._stopped.wait()
+        await self.drain()
+
+    def stop(self):
+        """Ask serve() to drain and return"""
+        self._stopped.set()
+
+    async def drain(self):
+        """Stop accepting, finish the questions already admitted, then close"""
+        self.draining = True
+        print(f"🛑 Draining (pid {os.getpid()}): {self._queue.qsize()} queued, "
+              f"{len(self._connections)} connections", file=sys.stderr)
+        self._server.close()
+        for writer in list(self._idle):
+            writer.close()
+        if self._connections:
+            # Busy connections close themselves after their current response
+            _, pending = await asyncio.wait(self._connections, timeout=self.drain_timeout)
+            for task in pending:
+                task.cancel()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        print(f"👋 Stopped (pid {os.getpid()}): {self.stats['requests']} requests, "
+              f"{self.stats['rejected']} rejected", file=sys.stderr)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve requests on one connection until either side closes it"""
+        task = asyncio.current_task()
+        self._connections.add(task)
+        self.stats["connections"] += 1
+        try:
+            keep_alive = True
+            while keep_alive and not self.draining:
+                self._idle.add(writer)
+                try:
+                    request = await asyncio.wait_for(
+                        self._read_request(reader, writer), self.keep_alive_timeout
+                    )
+                except HttpError as e:
+                    await self._send(writer, e.status, {"error": str(e)}, False, e.headers)
+                    break
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                finally:
+                    self._idle.discard(writer)
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                extra_headers = None
+                try:
+                    status, payload = await self._dispatch(method, path, body)
+                except HttpError as e:
+                    status, payload, extra_headers = e.status, {"error": str(e)}, e.headers
+                # Decided after answering: a drain may have started meanwhile
+                keep_alive = self._wants_keep_alive(headers) and not self.draining
+                await self._send(writer, status, payload, keep_alive, extra_headers)
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Read one request
+
+        Returns:
+            (method, path, headers, body), or None if the client closed the
+            connection between requests
+        """
+        try:
+            line = await reader.readline()
+        except ValueError:
+            raise HttpError(414, "Request line too long") from None
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+        except ValueError:
+            raise HttpError(400, "Malformed request line") from None
+        if not version.startswith("HTTP/1."):
+            raise HttpError(505, f"Unsupported protocol {version}")
+
+        headers = {"_version": version}
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                raise HttpError(431, "Header line too long") from None
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) > MAX_HEADERS:
+                raise HttpError(431, "Too many headers")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HttpError(411, "Send a Content-Length instead of a chunked body")
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise HttpError(400, "Invalid Content-Length") from None
+        if length < 0:
+            raise HttpError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, f"Body over {MAX_BODY_BYTES} bytes")
+        if length and headers.get("expect", "").lower() == "100-continue":
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        body = b""
+        if length:
+            # A body trickled in slowly would hold the connection for the whole keep-alive
+            try:
+                body = await asyncio.wait_for(reader.readexactly(length), BODY_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise HttpError(408, "Timed out reading the request body") from None
+        return method.upper(), target.split("?", 1)[0], headers, body
+
+    @staticmethod
+    def _wants_keep_alive(headers: dict) -> bool:
+        connection = headers.get("connection", "").lower()
+        if headers["_version"] == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> tuple:
+        """Route a request; returns (status, payload)"""
+        self.stats["requests"] += 1
+        self.agent.metrics.incr("http_requests")
+        routes = {
+            "/question": ("POST", self._question),
+            "/batch": ("POST", self._batch),
+            "/healthz": ("GET", self._health),
+            "/metrics": ("GET", self._metrics),
+        }
+        route = routes.get(path)
+        if route is None:
+            raise HttpError(404, f"No such endpoint: {path}")
+        allowed, handler = route
+        if method != allowed:
+            raise HttpError(405, f"Use {allowed} for {path}", {"Allow": allowed})
+        if self.draining and allowed == "POST":
+            raise HttpError(503, "Server is shutting down", {"Retry-After": "1"})
+        return await handler(self._parse_json(body) if allowed == "POST" else None)
+
+    @staticmethod
+    def _parse_json(body: bytes):
+        try:
+            return json.loads(body or b"{}")
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise HttpError(400, "Body must be JSON") from None
+
+    async def _question(self, request) -> tuple:
+        if not isinstance(request, dict) or not isinstance(request.get("question"), str) \
+                or not request["question"].strip():
+            raise HttpError(400, "Expected {\"question\": \"...\"}")
+        deadline = self._deadline(request)
+        future = self._submit([request["question"]], deadline)[0]
+        result = await future
+        return (502 if "error" in result else 200), result
+
+    async def _batch(self, request) -> tuple:
+        questions = request.get("questions") if isinstance(request, dict) else request
+        if not isinstance(questions, list) or not all(isinstance(q, str) for q in questions):
+            raise HttpError(400, "Expected {\"questions\": [\"...\", ...]}")
+        if len(questions) > self.max_batch:
+            raise HttpError(413, f"At most {self.max_batch} questions per batch")
+        deadline = self._deadline(request if isinstance(request, dict) else {})
+        results = await asyncio.gather(*self._submit(questions, deadline))
+        return 200, {"answers": results}
+
+    async def _health(self, _) -> tuple:
+        if self.draining:
+            raise HttpError(503, "draining")
+        return 200, {"status": "ok", "queued": self._queue.qsize(), "pid": os.getpid()}
+
+    async def _metrics(self, _) -> tuple:
+        if not self.agent.metrics.enabled:
+            raise HttpError(404, "Metrics are disabled; set WEATHER_AGENT_METRICS=1")
+        return 200, self.agent.metrics.to_prometheus()
+
+    @staticmethod
+    def _deadline(request: dict):
+        """Deadline for a request's optional "timeout" in seconds, counted from arrival"""
+        timeout = request.get("timeout")
+        if timeout is None:
+            return None
+        if not isinstance(timeout, (int, float)) or timeout <= 0:
+            raise HttpError(400, "\"timeout\" must be a positive number of seconds")
+        return Deadline.after(timeout)
+
+    def _submit(self, questions: list, deadline) -> list:
+        """
+        Queue questions for the workers, all or none
+
+        Returns:
+            One future per question, resolving to its result dict
+
+        Raises:
+            HttpError: 503 if the queue can't take every question
+        """
+        free = self.queue_size - self._queue.qsize()
+        if len(questions) > free:
+            self.stats["rejected"] += 1
+            self.agent.metrics.incr("http_rejected")
+            raise HttpError(503, "Server is overloaded, try again later", {"Retry-After": "1"})
+        loop = asyncio.get_running_loop()
+        futures = []
+        for question in questions:
+            future = loop.create_future()
+            self._queue.put_nowait((question, deadline, future))
+            futures.append(future)
+        self.agent.metrics.set_gauge("http_queue_depth", self._queue.qsize())
+        return futures
+
+    async def _worker(self):
+        """Answer queued questions one at a time"""
+        while True:
+            question, deadline, future = await self._queue.get()
+            try:
+                if not future.done():
+                    future.set_result(await self._answer(question, deadline))
+            except Exception as e:
+                if not future.done():
+                    future.set_result({"question": question, "error": str(e)})
+            finally:
+                self._queue.task_done()
+
+    async def _answer(self, question: str, deadline) -> dict:
+        """Result dict for one question, from the agent's final event"""
+        final = {}
+
+        def keep_final(event):
+            if event["type"] in ("done", "error"):
+                final.update(event)
+
+        await self.agent.answer_question_async(question, deadline=deadline, on_event=keep_final)
+        result = {"question": question}
+        if final.get("type") == "done":
+            result["answer"] = final["text"]
+        else:
+            result["error"] = final.get("text", "No answer")
+        if final.get("fallback"):
+            result["fallback"] = True
+        result["elapsed_ms"] = final.get("elapsed_ms")
+        return result
+
+    async def _send(self, writer: asyncio.StreamWriter, status: int, payload,
+                    keep_alive: bool, headers: dict = None):
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            body, content_type = json.dumps(payload).encode("utf-8"), "application/json"
+        lines = [
+            f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        if keep_alive:
+            lines.append(f"Keep-Alive: timeout={int(self.keep_alive_timeout)}")
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+
+def build_agent(args) -> WeatherAgent:
+    """WeatherAgent for one server process, with the fake model if asked for"""
+    client = None
+    if args.fake:
+        client = FakeGeminiClient(
+            latency_ms=args.latency_ms, error_rate=args.error_rate, seed=args.seed
+        )
+    agent = WeatherAgent(client=client)
+    if args.fake:
+        client.weather_tool = agent.weather_tool
+    # Load lazy state now, not on the event loop in the first request
+    agent.warm_up()
+    return agent
+
+
+def serve_process(args, sock: socket.socket = None):
+    """Run one server process until it is signalled and drained"""
+    server = WeatherServer(
+        build_agent(args), concurrency=args.concurrency, queue_size=args.queue_size,
+        max_batch=args.max_batch, keep_alive_timeout=args.keep_alive,
+        drain_timeout=args.drain_timeout,
+    )
+    asyncio.run(server.serve(args.host, args.port, sock))
+
+
+def serve_workers(args):
+    """
+    Fork args.workers processes that accept on one shared listening socket
+
+    Each process has its own agent, caches and event loop. SIGTERM or
+    SIGINT to the parent is passed on, and every worker drains.
+    """
+    sock = socket.create_server((args.host, args.port), backlog=1024)
+    children = []
+    for _ in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                serve_process(args, sock)
+            except BaseException:
+                # os._exit skips the interpreter's own traceback printing
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stderr.flush()
+                os._exit(code)
+        children.append(pid)
+    sock.close()
+
+    def forward(signum, _frame):
+        for child in children:
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(child, signum)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    print(f"🚀 {args.workers} worker processes on {args.host}:{args.port}", file=sys.stderr)
+    for child in children:
+        _, status = os.waitpid(child, 0)
+        code = os.waitstatus_to_exitcode(status)
+        if code == 0:
+            print(f"✅ Worker {child} exited", file=sys.stderr)
+        elif code < 0:
+            print(f"❌ Worker {child} was killed by signal {-code}", file=sys.stderr)
+        else:
+            print(f"❌ Worker {child} exited with status {code}", file=sys.stderr)
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Serve the Weather Agent over HTTP")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080, help="Port to bind (default: 8080)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes sharing the listening socket (default: 1)")
+    parser.add_argument("--concurrency", type=int,
+                        help="Questions answered at once per process "
+                             "(default: WEATHER_AGENT_MAX_CONCURRENCY)")
+    parser.add_argument("--queue-size", type=int, default=64,
+                        help="Questions waiting per process before 503s (default: 64)")
+    parser.add_argument("--max-batch", type=int, default=100,
+                        help="Most questions in one /batch request (default: 100)")
+    parser.add_argument("--keep-alive", type=float, default=15.0,
+                        help="Seconds an idle connection stays open (default: 15)")
+    parser.add_argument("--drain-timeout", type=float, default=30.0,
+                        help="Seconds to finish in-flight requests on shutdown (default: 30)")
+    fake = parser.add_argument_group("fake model (offline)")
+    fake.add_argument("--fake", action="store_true",
+                      help="Answer with the offline fake model instead of Gemini")
+    fake.add_argument("--latency-ms", type=float, default=300.0,
+                      help="Median fake model turn latency (default: 300)")
+    fake.add_argument("--error-rate", type=float, default=0.0,
+                      help="Fraction of fake model turns that fail")
+    fake.add_argument("--seed", type=int, help="Seed for reproducible runs")
+    args = parser.parse_args()
+
+    # Agent setup messages go to stderr with the server's own log
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    started = time.perf_counter()
+    if args.workers > 1:
+        serve_workers(args)
+    else:
+        serve_process(args)
+    print(f"⏱️  Served for {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
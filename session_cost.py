@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Measure what each Streamlit browser session costs
+
+Opens N simulated sessions of streamlit_app.py in this process with
+Streamlit's AppTest harness, keeps them all alive like a server would,
+and reports the time to render each session's first page and the
+resident memory added per session.
+
+  python session_cost.py --sessions 20
+  python session_cost.py --sessions 20 --ask "What's the weather in London?"
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from streamlit.testing.v1 import AppTest
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process"""
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Not Linux: fall back to the peak, which still grows with sessions
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def open_session(script: str, question: str, timeout: float) -> AppTest:
+    """Render one new session's first page, optionally asking one question"""
+    app = AppTest.from_file(os.path.abspath(script), default_timeout=timeout)
+    app.run()
+    if question:
+        app.chat_input[0].set_value(question).run()
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    return app
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Measure per-session cost of the Streamlit app")
+    parser.add_argument("--sessions", type=int, default=10, help="Sessions to open (default: 10)")
+    parser.add_argument("--script", default="streamlit_app.py", help="Streamlit script to load")
+    parser.add_argument("--ask", default="", help="Question each session asks once")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds allowed per script run")
+    args = parser.parse_args()
+
+    sessions = []  # kept alive, like open browser tabs
+    timings = []
+    growth = []
+    baseline = rss_bytes()
+    for _ in range(args.sessions):
+        before = rss_bytes()
+        started = time.perf_counter()
+        sessions.append(open_session(args.script, args.ask, args.timeout))
+        timings.append(time.perf_counter() - started)
+        growth.append(rss_bytes() - before)
+
+    later = timings[1:] or timings
+    later_growth = growth[1:] or growth
+    print(f"📊 {args.sessions} sessions of {args.script}")
+    print(f"   first session:  {timings[0] * 1000:8.1f} ms  {growth[0] / 2**20:+7.2f} MiB")
+    print(f"   later sessions: {statistics.mean(later) * 1000:8.1f} ms  "
+          f"{statistics.mean(later_growth) / 2**20:+7.2f} MiB each (mean)")
+    print(f"   total RSS growth: {(rss_bytes() - baseline) / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
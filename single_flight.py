@@ -0,0 +1,225 @@
+"""
+Single-flight coalescing of identical concurrent work
+"""
+
+import asyncio
+import statistics
+import threading
+import time
+from collections import deque
+
+
+class FlightAbandoned(Exception):
+    """The leader of a flight stopped before producing a result"""
+
+
+class _Flight:
+    """One pending computation that threads can wait on"""
+
+    __slots__ = ("_event", "result", "error", "followers", "started")
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+        self.started = time.monotonic()
+
+    def wait(self, timeout: float = None):
+        """The leader's result; raises TimeoutError if it takes longer than timeout seconds"""
+        if not self._event.wait(timeout):
+            raise TimeoutError("Timed out waiting for the leader")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class _AsyncFlight:
+    """One pending computation that coroutines on one event loop can await"""
+
+    __slots__ = ("future", "followers", "started")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.future = loop.create_future()
+        self.followers = 0
+        self.started = time.monotonic()
+
+    async def wait(self, timeout: float = None):
+        """The leader's result; raises TimeoutError if it takes longer than timeout seconds"""
+        # Shielded so a cancelled follower doesn't cancel everyone's result
+        try:
+            return await asyncio.wait_for(asyncio.shield(self.future), timeout)
+        except asyncio.TimeoutError:
+            # Nobody may be left to retrieve a later exception
+            self.future.add_done_callback(_retrieve)
+            raise TimeoutError("Timed out waiting for the leader") from None
+
+
+def _retrieve(future: asyncio.Future):
+    if not future.cancelled():
+        future.exception()
+
+
+class SingleFlight:
+    """
+    Lets concurrent callers with the same key share one computation
+
+    The first caller for a key becomes the leader and does the work; callers
+    that arrive while it runs become followers and receive the leader's
+    result, or its exception. Nothing is remembered once a flight lands, so
+    this only deduplicates work that is in progress (caching is separate).
+
+    If the leader is cancelled or abandons the work, followers get
+    FlightAbandoned; do() and do_async() then retry, so one of the
+    followers takes over as the new leader.
+
+    Threads coalesce with threads and coroutines with coroutines on the
+    same event loop. The durations of recent successful flights are kept,
+    so followers can tell a slow leader from a normal one.
+    """
+
+    # Successful flights whose durations typical_duration() looks at
+    RECENT_FLIGHTS = 32
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}  # key -> _Flight
+        self._async_flights = {}  # (loop, key) -> _AsyncFlight
+        self._durations = deque(maxlen=self.RECENT_FLIGHTS)
+        self.stats = {"leaders": 0, "coalesced": 0, "errors": 0, "abandoned": 0, "left": 0}
+
+    def begin(self, key) -> tuple:
+        """
+        Join the flight for key from a thread
+
+        Returns:
+            (flight, is_leader). A leader must finish the flight with
+            resolve(), fail() or abandon(); a follower calls flight.wait(),
+            optionally with a timeout. flight.started is the leader's
+            time.monotonic() start, for followers that cap their wait.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                self.stats["coalesced"] += 1
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            self.stats["leaders"] += 1
+            return flight, True
+
+    def begin_async(self, key) -> tuple:
+        """Join the flight for key from a coroutine; same contract as begin()"""
+        loop_key = (asyncio.get_running_loop(), key)
+        with self._lock:
+            flight = self._async_flights.get(loop_key)
+            if flight is not None:
+                flight.followers += 1
+                self.stats["coalesced"] += 1
+                return flight, False
+            flight = self._async_flights[loop_key] = _AsyncFlight(loop_key[0])
+            self.stats["leaders"] += 1
+            return flight, True
+
+    def resolve(self, key, flight, result):
+        """Land a flight with its result"""
+        with self._lock:
+            self._durations.append(time.monotonic() - flight.started)
+        self._land(key, flight, result, None)
+
+    def typical_duration(self):
+        """Median seconds of recent successful flights, or None before the first"""
+        with self._lock:
+            if not self._durations:
+                return None
+            return statistics.median(self._durations)
+
+    def fail(self, key, flight, error: BaseException):
+        """Land a flight with an exception that every follower re-raises"""
+        with self._lock:
+            self.stats["errors"] += 1
+        self._land(key, flight, None, error)
+
+    def abandon(self, key, flight):
+        """Land a flight without a result; followers get FlightAbandoned"""
+        with self._lock:
+            self.stats["abandoned"] += 1
+        self._land(key, flight, None, FlightAbandoned(f"Leader abandoned {key!r}"))
+
+    def leave(self, flight):
+        """Record that a follower stopped waiting for flight and does the work itself"""
+        with self._lock:
+            self.stats["left"] += 1
+
+    def do(self, key, fn):
+        """Run fn() once for all threads asking for key at the same time"""
+        while True:
+            flight, leader = self.begin(key)
+            if leader:
+                return self._lead(key, flight, fn)
+            try:
+                return flight.wait()
+            except FlightAbandoned:
+                continue
+
+    async def do_async(self, key, fn):
+        """Await fn() once for all coroutines asking for key at the same time"""
+        while True:
+            flight, leader = self.begin_async(key)
+            if leader:
+                try:
+                    result = await fn()
+                except asyncio.CancelledError:
+                    self.abandon(key, flight)
+                    raise
+                except Exception as e:
+                    self.fail(key, flight, e)
+                    raise
+                self.resolve(key, flight, result)
+                return result
+            try:
+                return await flight.wait()
+            except FlightAbandoned:
+                continue
+
+    def get_stats(self) -> dict:
+        """Snapshot of leader, coalesced, error, abandoned and left counters"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["in_flight"] = len(self._flights) + len(self._async_flights)
+            return stats
+
+    def _lead(self, key, flight, fn):
+        try:
+            result = fn()
+        except Exception as e:
+            self.fail(key, flight, e)
+            raise
+        except BaseException:
+            self.abandon(key, flight)
+            raise
+        self.resolve(key, flight, result)
+        return result
+
+    def _land(self, key, flight, result, error):
+        with self._lock:
+            if isinstance(flight, _AsyncFlight):
+                flights, flight_key = self._async_flights, (flight.future.get_loop(), key)
+            else:
+                flights, flight_key = self._flights, key
+            if flights.get(flight_key) is flight:
+                del flights[flight_key]
+
+        if isinstance(flight, _AsyncFlight):
+            if flight.future.done():
+                return
+            if error is None:
+                flight.future.set_result(result)
+            else:
+                flight.future.set_exception(error)
+                if not flight.followers:
+                    flight.future.exception()  # mark retrieved; nobody is waiting
+        else:
+            flight.result = result
+            flight.error = error
+            flight._event.set()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark for the Weather Agent CLI
+
+Starts `python main.py` in fresh processes (answering "quit" right away)
+and reports wall time and peak memory, in mock mode and with an API key.
+A third scenario times the Gemini SDK setup that real mode now defers
+to the first question, so the deferred cost is tracked too.
+
+  python startup_benchmark.py --runs 10
+  python startup_benchmark.py --json startup.json
+  python startup_benchmark.py --importtime   # slowest imports of main.py
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# A syntactically valid key; nothing here sends a request
+DUMMY_KEY = "startup-benchmark-key"
+
+FIRST_REQUEST_SETUP = (
+    "from gemini_client import GeminiClient\n"
+    f"client = GeminiClient('{DUMMY_KEY}', 'gemini-1.5-flash')\n"
+    "client.model\n"
+    "client._to_contents([{'role': 'user', 'text': 'hi'}])\n"
+)
+
+SCENARIOS = {
+    "mock": (["main.py"], {"GOOGLE_API_KEY": ""}),
+    "real": (["main.py"], {"GOOGLE_API_KEY": DUMMY_KEY}),
+    "real_first_request": (["-c", FIRST_REQUEST_SETUP], {"GOOGLE_API_KEY": DUMMY_KEY}),
+}
+
+
+def run_once(args: list, env: dict) -> tuple:
+    """
+    Run one Python process to completion
+
+    Returns:
+        (wall seconds, peak RSS in bytes)
+    """
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable] + args,
+        stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env={**os.environ, **env},
+    )
+    process.stdin.write(b"quit\n")
+    process.stdin.close()
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - started
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise RuntimeError(f"{' '.join(args)} exited with {process.returncode}")
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    peak = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return elapsed, peak
+
+
+def measure(runs: int) -> dict:
+    """Median and best wall time plus peak RSS for every scenario"""
+    results = {}
+    for name, (args, env) in SCENARIOS.items():
+        run_once(args, env)  # warm the OS file cache and bytecode
+        samples = [run_once(args, env) for _ in range(runs)]
+        times = [elapsed for elapsed, _ in samples]
+        results[name] = {
+            "median_ms": round(statistics.median(times) * 1000, 1),
+            "min_ms": round(min(times) * 1000, 1),
+            "peak_rss_mib": round(max(peak for _, peak in samples) / 2**20, 1),
+        }
+        print(f"{name:<20} {results[name]['median_ms']:>8} ms median "
+              f"{results[name]['min_ms']:>8} ms best "
+              f"{results[name]['peak_rss_mib']:>7} MiB peak", file=sys.stderr)
+    return results
+
+
+def print_importtime(top: int):
+    """Show the modules that dominate `python main.py` import time in mock mode"""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True, text=True, env={**os.environ, "GOOGLE_API_KEY": ""},
+    )
+    rows = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), module.rstrip()))
+    for cumulative, module in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative / 1000:>9.1f} ms  {module}")
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Benchmark Weather Agent startup")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per scenario (default: 5)")
+    parser.add_argument("--json", help="Also write the results as JSON to this file")
+    parser.add_argument("--importtime", action="store_true",
+                        help="List the slowest imports instead of timing startup")
+    parser.add_argument("--top", type=int, default=15, help="Modules listed by --importtime")
+    args = parser.parse_args()
+
+    if args.importtime:
+        print_importtime(args.top)
+        return
+
+    results = measure(args.runs)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
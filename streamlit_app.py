@@ -6,7 +6,6 @@ Uses the existing modular structure without changes
 import streamlit as st
 import json
 from weather_agent import WeatherAgent
-from config import Config
 
 # Configure Streamlit page
 st.set_page_config(
@@ -16,23 +15,42 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+@st.cache_resource
+def get_shared_agent() -> WeatherAgent:
+    """
+    One WeatherAgent for every browser session of this process
+    
+    The agent, its Gemini client and its caches are thread-safe, so
+    sessions share them; only the conversation lives in st.session_state.
+    Lazy state is loaded here, once, instead of in the first session's
+    first question.
+    """
+    agent = WeatherAgent()
+    agent.warm_up()
+    return agent
+
+
 class StreamlitWeatherApp:
     """Streamlit web interface for the Weather Agent"""
     
+    WELCOME = "Hello! I'm your weather assistant. Ask me about the weather in any city!"
+    
+    # Chat messages rendered per page; older ones load on demand
+    HISTORY_PAGE = 20
+    
     def __init__(self):
         self.agent = None
-        self.config = Config()
+        self.config = None
     
     def initialize_agent(self):
-        """Initialize the weather agent (with caching)"""
-        if 'agent' not in st.session_state:
-            try:
-                st.session_state.agent = WeatherAgent()
-                st.session_state.agent_initialized = True
-            except Exception as e:
-                st.session_state.agent = None
-                st.session_state.agent_error = str(e)
-                st.session_state.agent_initialized = False
+        """Attach the process-wide agent (built on the first session only)"""
+        try:
+            self.agent = get_shared_agent()
+            self.config = self.agent.config
+            st.session_state.agent_initialized = True
+        except Exception as e:
+            st.session_state.agent_error = str(e)
+            st.session_state.agent_initialized = False
     
     def render_header(self):
         """Render the app header"""
@@ -88,29 +106,55 @@ class StreamlitWeatherApp:
             
             *Other cities return default pleasant weather*
             """)
+            
+            if st.button("🧹 New conversation"):
+                st.session_state.conversation.clear()
+                st.session_state.history_shown = self.HISTORY_PAGE
+                st.session_state.pop("last_debug", None)
+                st.rerun()
+            
+            agent = self.agent
+            if agent.metrics.enabled:
+                st.header("📊 Metrics")
+                snapshot = agent.metrics.snapshot()
+                for stage, data in sorted(snapshot["stages"].items()):
+                    st.caption(
+                        f"**{stage}**: {data['count']} × {data['mean'] * 1000:.1f} ms avg, "
+                        f"p95 ≤ {data['p95'] * 1000:g} ms"
+                    )
+                with st.expander("Raw metrics"):
+                    st.json(snapshot["counters"])
+                    st.code(agent.metrics.to_prometheus(), language="text")
+    
+    def init_conversation(self):
+        """Give this browser session its own conversation memory"""
+        if 'conversation' not in st.session_state:
+            st.session_state.conversation = self.agent.new_conversation()
+            st.session_state.history_shown = self.HISTORY_PAGE
     
     def render_chat_interface(self):
         """Render the main chat interface"""
-        # Initialize chat history
-        if 'messages' not in st.session_state:
-            st.session_state.messages = [
-                {
-                    "role": "assistant", 
-                    "content": "Hello! I'm your weather assistant. Ask me about the weather in any city!"
-                }
-            ]
+        conversation = st.session_state.conversation
         
-        # Display chat history
-        for message in st.session_state.messages:
-            with st.chat_message(message["role"]):
-                st.write(message["content"])
-                
-                # Show debug info for assistant messages if in mock mode
-                if (message["role"] == "assistant" and 
-                    not self.config.has_api_key() and 
-                    "debug_info" in message):
-                    with st.expander("🔧 Debug Info (Mock Mode)"):
-                        st.json(message["debug_info"])
+        # Rerendering a long chat on every rerun is slow; show the latest page
+        hidden = len(conversation) - st.session_state.history_shown
+        if hidden > 0:
+            if st.button(f"⬆️ Show older messages ({hidden} hidden)", key="show_older"):
+                st.session_state.history_shown += self.HISTORY_PAGE
+                st.rerun()
+        else:
+            with st.chat_message("assistant"):
+                st.write(self.WELCOME)
+        
+        for message in conversation.recent(st.session_state.history_shown):
+            with st.chat_message(message.role):
+                st.write(message.text)
+        
+        # Debug output is only kept for the latest mock answer
+        debug_output = st.session_state.get("last_debug")
+        if debug_output and not self.config.has_api_key():
+            with st.expander("🔧 Debug Info (Mock Mode)"):
+                st.json(debug_output)
         
         # Chat input
         if prompt := st.chat_input("Ask about the weather..."):
@@ -118,8 +162,8 @@ class StreamlitWeatherApp:
     
     def handle_user_input(self, user_input: str):
         """Handle user input and get agent response"""
-        # Add user message to chat
-        st.session_state.messages.append({"role": "user", "content": user_input})
+        conversation = st.session_state.conversation
+        st.session_state.pop("last_debug", None)
         
         # Display user message
         with st.chat_message("user"):
@@ -127,48 +171,58 @@ class StreamlitWeatherApp:
         
         # Get agent response
         with st.chat_message("assistant"):
-            with st.spinner("🤔 Thinking..."):
-                try:
-                    agent = st.session_state.agent
-                    
-                    # Capture debug info for mock mode
-                    if not self.config.has_api_key():
-                        # For mock mode, we'll capture the printed debug info
-                        import io
-                        import contextlib
-                        
-                        captured_output = io.StringIO()
-                        with contextlib.redirect_stdout(captured_output):
-                            response = agent.answer_question(user_input)
-                        
-                        debug_output = captured_output.getvalue()
-                        debug_info = {"mock_output": debug_output.strip()}
-                    else:
-                        response = agent.answer_question(user_input)
-                        debug_info = None
-                    
-                    # Display response
-                    st.write(response)
-                    
-                    # Add to chat history
-                    message_data = {"role": "assistant", "content": response}
-                    if debug_info:
-                        message_data["debug_info"] = debug_info
-                    
-                    st.session_state.messages.append(message_data)
-                    
-                    # Show debug info in mock mode
-                    if debug_info and not self.config.has_api_key():
-                        with st.expander("🔧 Debug Info (Mock Mode)"):
-                            st.text(debug_info["mock_output"])
+            status = st.empty()
+            placeholder = st.empty()
+            status.caption("🤔 Thinking...")
+            try:
+                # The agent adds the turn to the conversation. The events of
+                # this request are its own, so concurrent sessions can't mix
+                # up each other's debug info.
+                trace = []
+                self.render_answer_stream(
+                    self.agent.answer_question_stream(user_input, conversation=conversation),
+                    status, placeholder, trace
+                )
                 
-                except Exception as e:
-                    error_msg = f"Sorry, I encountered an error: {str(e)}"
-                    st.error(error_msg)
-                    st.session_state.messages.append({
-                        "role": "assistant", 
-                        "content": error_msg
-                    })
+                # Show debug info in mock mode
+                if not self.config.has_api_key():
+                    st.session_state.last_debug = trace
+                    with st.expander("🔧 Debug Info (Mock Mode)"):
+                        st.json(trace)
+            
+            except Exception as e:
+                status.empty()
+                error_msg = f"Sorry, I encountered an error: {str(e)}"
+                st.error(error_msg)
+                conversation.add_turn(user_input, error_msg, remember=False)
+    
+    def render_answer_stream(self, events, status, placeholder, trace: list = None) -> str:
+        """
+        Render streamed agent events incrementally and return the final answer
+        
+        Every event except answer tokens is also appended to trace, if given.
+        """
+        text = ""
+        response = ""
+        with self.agent.metrics.span("ui_turn"):
+            for event in events:
+                if trace is not None and event["type"] != "token":
+                    trace.append(event)
+                if event["type"] == "tool_call":
+                    location = event["args"].get("location")
+                    if location:
+                        status.caption(f"🔧 Looking up the weather in {location}...")
+                    else:
+                        status.caption(f"🔧 Calling {event['name']}...")
+                elif event["type"] == "token":
+                    text += event["text"]
+                    placeholder.markdown(text + "▌")
+                elif event["type"] in ("done", "error"):
+                    response = event["text"]
+        
+        status.empty()
+        placeholder.write(response)
+        return response
     
     def render_footer(self):
         """Render the footer with additional info"""
@@ -200,6 +254,7 @@ class StreamlitWeatherApp:
             return
         
         # Render the UI
+        self.init_conversation()
         self.render_header()
         self.render_sidebar()
         self.render_chat_interface()
@@ -0,0 +1,56 @@
+"""
+Tests for ResponseFormatter intent detection
+"""
+
+import pytest
+
+from response_formatter import ResponseFormatter
+
+
+@pytest.fixture
+def formatter():
+    return ResponseFormatter()
+
+
+@pytest.mark.parametrize("question", [
+    "What are the temperatures in Paris?",
+    "temps in London today",
+    "Is it hotter in Tokyo?",
+    "Is it getting colder in Paris?",
+    "How warm is it in Madrid?",
+    "How many degrees is it in Rome?",
+])
+def test_inflected_temperature_words(formatter, question):
+    assert formatter.detect_intent(question) == "temperature"
+    assert formatter.lookup_intent(question) == "temperature"
+
+
+@pytest.mark.parametrize("question", [
+    "What's London's humidity's level?",
+    "How humid is Singapore?",
+    "Is it muggy in Miami?",
+])
+def test_inflected_humidity_words(formatter, question):
+    assert formatter.detect_intent(question) == "humidity"
+    assert formatter.lookup_intent(question) == "humidity"
+
+
+@pytest.mark.parametrize("question", [
+    "Is there rain in London?",
+    "Is it raining in Paris?",
+    "Is it cloudy in Tokyo?",
+    "What are the conditions in Oslo?",
+])
+def test_condition_words(formatter, question):
+    assert formatter.lookup_intent(question) == "conditions"
+
+
+def test_words_only_match_at_their_start(formatter):
+    # "attempt" contains "temp" and "brain" contains "rain", but neither starts with them
+    assert formatter.lookup_intent("I attempt to explore Paris") is None
+    assert formatter.lookup_intent("brain teaser about Paris") is None
+
+
+def test_complex_questions_are_not_lookups(formatter):
+    assert formatter.lookup_intent("Should I bring a coat, is it cold in Paris?") is None
+    assert formatter.lookup_intent("Which city is hotter, Paris or Rome?") is None
@@ -0,0 +1,43 @@
+"""
+Structured weather lookup result returned by WeatherTool
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class WeatherReport:
+    """Immutable weather reading for one location"""
+    
+    __slots__ = ("location", "temperature", "description", "humidity", "note")
+    
+    location: str
+    temperature: int
+    description: str
+    humidity: int
+    note: Optional[str]
+    
+    def to_dict(self) -> dict:
+        """Dict form sent to the LLM (same shape as the original tool JSON)"""
+        result = {
+            "location": self.location,
+            "temperature": self.temperature,
+            "description": self.description,
+            "humidity": self.humidity,
+            "success": True
+        }
+        if self.note:
+            result["note"] = self.note
+        return result
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> "WeatherReport":
+        """Rebuild a report from its to_dict() form (e.g. a get_weather result)"""
+        return cls(
+            location=data["location"],
+            temperature=data["temperature"],
+            description=data["description"],
+            humidity=data["humidity"],
+            note=data.get("note")
+        )
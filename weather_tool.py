@@ -3,40 +3,89 @@ Simple Weather Tool with hardcoded responses for LLM function calling
 """
 
 import json
+import re
+import threading
+from city_store import CityStore
+from location_matcher import LocationMatcher
+from metrics import Metrics
+from weather_report import WeatherReport
+
+# Text following a standalone "in", up to the end of the clause
+_IN_PLACE = re.compile(r"\bin\s+([^?!.,;]+)")
+
+# Hardcoded weather data for demo purposes
+BUILTIN_CITIES = [
+    {
+        "name": "San Francisco",
+        "aliases": ["SF", "San Fran"],
+        "temperature": 18,
+        "description": "Partly cloudy",
+        "humidity": 65
+    },
+    {
+        "name": "New York",
+        "aliases": ["NYC", "New York City"],
+        "temperature": 12,
+        "description": "Sunny",
+        "humidity": 45
+    },
+    {
+        "name": "London",
+        "temperature": 8,
+        "description": "Rainy",
+        "humidity": 80
+    },
+    {
+        "name": "Tokyo",
+        "temperature": 22,
+        "description": "Clear",
+        "humidity": 55
+    },
+    {
+        "name": "Paris",
+        "temperature": 15,
+        "description": "Cloudy",
+        "humidity": 70
+    }
+]
 
 
 class WeatherTool:
-    """A simple tool that returns hardcoded weather information"""
+    """A simple tool that returns weather information from a city table"""
     
-    def __init__(self):
-        # Hardcoded weather data for demo purposes
-        self.weather_data = {
-            "san francisco": {
-                "temperature": 18,
-                "description": "Partly cloudy",
-                "humidity": 65
-            },
-            "new york": {
-                "temperature": 12,
-                "description": "Sunny", 
-                "humidity": 45
-            },
-            "london": {
-                "temperature": 8,
-                "description": "Rainy",
-                "humidity": 80
-            },
-            "tokyo": {
-                "temperature": 22,
-                "description": "Clear",
-                "humidity": 55
-            },
-            "paris": {
-                "temperature": 15,
-                "description": "Cloudy",
-                "humidity": 70
-            }
-        }
+    # How long a reading stays fresh, in seconds
+    OBSERVATION_TTL = 600
+    # Default weather for unknown locations is a placeholder that never changes
+    DEFAULT_DATA_TTL = 3600
+    # Upper bounds on memoized reports and JSON payloads
+    MAX_REPORTS = 4096
+    MAX_PAYLOADS = 4096
+    MAX_FORECAST_CITIES = 16384
+    # Length of the forecast series answered by query_forecast
+    FORECAST_DAYS = 7
+    # Cities whose forecast series are kept in memory
+    MAX_FORECAST_ROWS = 4096
+    
+    def __init__(self, city_store: CityStore = None, metrics: Metrics = None):
+        # Indexed city table; defaults to the small built-in demo list
+        if city_store is None:
+            city_store = CityStore.from_records(BUILTIN_CITIES)
+        self.city_store = city_store
+        
+        # Reports and JSON payloads are memoized per city; built-in ones up front
+        self._reports = {}
+        self._payloads = {}
+        self._matcher = None
+        self._matcher_lock = threading.Lock()
+        self._forecast = None
+        self._forecast_cities = {}  # location as asked -> (row, display name)
+        self._forecast_lock = threading.Lock()
+        self.metrics = Metrics(enabled=False)  # warm-up lookups aren't measured
+        for city in BUILTIN_CITIES:
+            self.to_payload(self.get_weather_report(city["name"]))
+        
+        if metrics is not None:
+            self.metrics = metrics
     
     def get_weather(self, location: str) -> str:
         """
@@ -49,30 +98,67 @@ class WeatherTool:
         Returns:
             JSON string with weather info
         """
-        location_key = location.lower().strip()
+        return self.to_payload(self.get_weather_report(location))
+    
+    def get_weather_report(self, location: str) -> WeatherReport:
+        """
+        Get weather for a location as a structured report (no JSON involved)
         
-        # Return hardcoded data if location is known
-        if location_key in self.weather_data:
-            data = self.weather_data[location_key]
-            result = {
-                "location": location.title(),
-                "temperature": data["temperature"],
-                "description": data["description"],
-                "humidity": data["humidity"],
-                "success": True
-            }
-        else:
+        Args:
+            location: City name
+            
+        Returns:
+            WeatherReport for the location
+        """
+        with self.metrics.span("tool"):
+            # Return stored data if location is known
+            row = self.city_store.lookup(location)
+            if row is not None:
+                report = self._reports.get(row)
+                if report is None:
+                    report = WeatherReport(
+                        location=self.city_store.name(row),
+                        temperature=self.city_store.temperature(row),
+                        description=self.city_store.description(row),
+                        humidity=self.city_store.humidity(row),
+                        note=None
+                    )
+                    if len(self._reports) < self.MAX_REPORTS:
+                        self._reports[row] = report
+                return report
+            
             # Default response for unknown locations
-            result = {
-                "location": location.title(),
-                "temperature": 20,
-                "description": "Pleasant",
-                "humidity": 60,
-                "success": True,
-                "note": "Using default weather data"
-            }
+            self.metrics.incr("default_weather")
+            return WeatherReport(
+                location=location.strip().title(),
+                temperature=20,
+                description="Pleasant",
+                humidity=60,
+                note="Using default weather data"
+            )
+    
+    def to_payload(self, report: WeatherReport) -> str:
+        """Serialize a report for the LLM, reusing previously built JSON"""
+        payload = self._payloads.get(report)
+        if payload is None:
+            payload = json.dumps(report.to_dict())
+            if len(self._payloads) < self.MAX_PAYLOADS:
+                self._payloads[report] = payload
+        return payload
+    
+    def get_data_ttl(self, location: str) -> int:
+        """
+        How long weather data for a location may be reused before refreshing
         
-        return json.dumps(result)
+        Args:
+            location: City name
+            
+        Returns:
+            Freshness window in seconds
+        """
+        if location in self.city_store:
+            return self.OBSERVATION_TTL
+        return self.DEFAULT_DATA_TTL
     
     def get_function_schema(self):
         """
@@ -93,18 +179,179 @@ class WeatherTool:
             }
         }
     
+    @property
+    def forecast_store(self):
+        """Forecasts, built per city as queries ask for them"""
+        if self._forecast is None:
+            with self._forecast_lock:
+                if self._forecast is None:
+                    # NumPy is only imported once a forecast is asked for
+                    from forecast_store import ForecastStore
+                    self._forecast = ForecastStore(
+                        self.city_store, self.FORECAST_DAYS, max_rows=self.MAX_FORECAST_ROWS
+                    )
+        return self._forecast
+    
+    def query_forecast(self, locations: list, metric: str = "temperature", aggregate: str = "max",
+                       threshold: float = None, start_day: int = 0, days: int = None,
+                       condition: str = None) -> str:
+        """
+        Aggregate forecasts over many cities at once
+        This function will be called by the LLM as a tool
+        
+        Args:
+            locations: City names to compare
+            metric: "temperature" or "humidity"
+            aggregate: "max", "min", "mean", "hours_above", "hours_below" or "hours_with"
+            threshold: Limit for hours_above and hours_below
+            start_day: First forecast day (0 is today)
+            days: Days to cover; defaults to the rest of the week
+            condition: Condition counted by hours_with (e.g. "Rainy")
+            
+        Returns:
+            JSON string with "results" mapping each known city to its value,
+            ranked lowest first for "min" and highest first otherwise
+        """
+        with self.metrics.span("forecast"):
+            rows, names, unknown = [], [], []
+            seen = set()
+            for location in locations:
+                city = self._forecast_city(location)
+                if city is None:
+                    unknown.append(location)
+                elif city[0] not in seen:
+                    seen.add(city[0])
+                    rows.append(city[0])
+                    names.append(city[1])
+            
+            store = self.forecast_store
+            values = store.aggregate(rows, metric, aggregate, start_day, days, threshold, condition)
+            order = values.argsort(kind="stable")
+            if aggregate != "min":
+                order = order[::-1]
+            if aggregate.startswith("hours_"):
+                rounded = values.astype(int).tolist()
+            else:
+                rounded = values.astype(float).round(1).tolist()
+            
+            end_day = store.days if days is None else min(store.days, start_day + days)
+            result = {
+                "metric": metric,
+                "aggregate": aggregate,
+                "unit": "hours" if aggregate.startswith("hours_") else store.UNITS[metric],
+                "start_day": start_day,
+                "days": end_day - start_day,
+                "results": {names[i]: rounded[i] for i in order.tolist()},
+            }
+            if threshold is not None:
+                result["threshold"] = threshold
+            if condition is not None:
+                result["condition"] = condition
+            if unknown:
+                self.metrics.incr("forecast_unknown_locations", len(unknown))
+                result["unknown_locations"] = unknown
+            return json.dumps(result)
+    
+    def _forecast_city(self, location: str):
+        """(row, display name) of a known city, memoized since queries repeat long lists"""
+        city = self._forecast_cities.get(location)
+        if city is None:
+            row = self.city_store.lookup(location)
+            if row is None:
+                return None
+            city = (row, self.city_store.name(row))
+            if len(self._forecast_cities) < self.MAX_FORECAST_CITIES:
+                self._forecast_cities[location] = city
+        return city
+    
+    def get_forecast_function_schema(self):
+        """
+        Return the query_forecast function schema for LLM tool calling
+        """
+        return {
+            "name": "query_forecast",
+            "description": (
+                "Compare the hourly weather forecast of one or more cities over the next "
+                f"{self.FORECAST_DAYS} days, e.g. the warmest of several cities this week or "
+                "the number of hours above 80% humidity in London"
+            ),
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "locations": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "City names to compare (e.g., ['London', 'Paris'])"
+                    },
+                    "metric": {
+                        "type": "string",
+                        "enum": ["temperature", "humidity"],
+                        "description": "Forecast series to aggregate (°C or %)"
+                    },
+                    "aggregate": {
+                        "type": "string",
+                        "enum": ["max", "min", "mean", "hours_above", "hours_below", "hours_with"],
+                        "description": (
+                            "max, min or mean of the metric; hours above or below the "
+                            "threshold; or hours with the given condition"
+                        )
+                    },
+                    "threshold": {
+                        "type": "number",
+                        "description": "Limit for hours_above and hours_below, in the metric's unit"
+                    },
+                    "condition": {
+                        "type": "string",
+                        "enum": ["Clear", "Partly cloudy", "Cloudy", "Rainy"],
+                        "description": "Condition counted by hours_with"
+                    },
+                    "start_day": {
+                        "type": "integer",
+                        "description": "First day of the range; 0 is today, 1 is tomorrow"
+                    },
+                    "days": {
+                        "type": "integer",
+                        "description": f"Number of days to cover (1 to {self.FORECAST_DAYS}); defaults to the whole forecast"
+                    }
+                },
+                "required": ["locations", "metric", "aggregate"]
+            }
+        }
+    
+    @property
+    def location_matcher(self) -> LocationMatcher:
+        """Name matcher over every city and alias, opened from the city database on first use"""
+        if self._matcher is None:
+            # Concurrent first callers wait for one build instead of each building
+            with self._matcher_lock:
+                if self._matcher is None:
+                    store = self.city_store
+                    contains = lambda name: store.lookup_normalized(name) is not None
+                    sections = store.matcher_sections()
+                    if sections is not None:
+                        self._matcher = LocationMatcher.from_sections(*sections, contains=contains)
+                    else:
+                        # Version 1 database files don't store the matcher
+                        self._matcher = LocationMatcher(
+                            (key for key, _ in store.iter_keys()), contains=contains
+                        )
+        return self._matcher
+    
+    def extract_locations(self, question: str) -> list:
+        """Every known city mentioned in a question, in order of appearance"""
+        return self.location_matcher.find_all(question)
+    
     def extract_location_fallback(self, question: str) -> str:
         """Extract location from question (simple fallback for mock mode)"""
-        question_lower = question.lower()
-        
-        if "in " in question_lower:
-            parts = question_lower.split("in ")
-            if len(parts) > 1:
-                return parts[-1].replace("?", "").strip()
-        
-        # Check for known cities
-        for city in self.weather_data.keys():
-            if city in question_lower:
-                return city
-        
-        return "San Francisco"
\ No newline at end of file
+        with self.metrics.span("extract_location"):
+            locations = self.extract_locations(question)
+            if locations:
+                return locations[0]
+            
+            # Unknown place named after "in" (e.g. "Is it humid in Miami?")
+            mentions = _IN_PLACE.findall(question.lower())
+            if mentions:
+                return mentions[-1].strip()
+            
+            self.metrics.incr("location_fallbacks")
+            return "San Francisco"
\ No newline at end of file